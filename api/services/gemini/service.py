@@ -1,54 +1,20 @@
 import os
 import time
+import hashlib
+import heapq
 import json
 import random
+import sqlite3
+import threading
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from google import genai
-
-VIDEO_ANALYSIS_PROMPT = """
-    Please give a detailed breakdown of the entire video, 
-    include the relevant timestamps and output in JSON List format.
-    Also please include what the individual speaker(s) were saying, the tone, any setting descriptions, key visual moments. 
-    Finally, at the base structure, give a speaker description detailing their appearance, gender, style, and personality.
-            
-    Provide similar JSON structure in this format:
-    {
-        "video_analysis": {
-            "speaker_description": {
-            "appearance": "Young adult male, approximately 25-30 years old, brown hair, casual attire",
-            "gender": "Male",
-            "style": "Casual gaming setup with RGB lighting, wearing a black hoodie",
-            "personality": "Energetic, enthusiastic, prone to excited outbursts during intense moments"
-            },
-            "timestamps": [
-            {
-                "time": "00:00-00:15",
-                "dialogue": "Hey everyone, welcome back to my channel! Today we're diving into this crazy new level.",
-                "tone": "Excited, welcoming",
-                "setting_description": "Gaming room with multiple monitors, LED strip lighting in background",
-                "key_visual_moments": "Player adjusts headset, gestures toward screen",
-                "action_context": "Introduction and setup"
-            },
-            {
-                "time": "00:16-00:45",
-                "dialogue": "Oh no, oh no, this is not going well... Wait, I think I can make this jump!",
-                "tone": "Anxious, then hopeful",
-                "setting_description": "Same gaming setup, player leaning forward intensely",
-                "key_visual_moments": "Close-up of concentrated facial expression, rapid hand movements",
-                "action_context": "Challenging gameplay sequence"
-            },
-            {
-                "time": "00:46-01:20",
-                "dialogue": "YES! Did you see that? That was absolutely insane!",
-                "tone": "Triumphant, elated",
-                "setting_description": "Player throws hands up in celebration",
-                "key_visual_moments": "Victory gesture, big smile, pointing at screen",
-                "action_context": "Successful completion of difficult section"
-            }
-            ]
-        }
-    }
-"""
+from google.genai import errors
+from constants import VIDEO_ANALYSIS_PROMPT
 
 
 # Get API key from environment
@@ -58,20 +24,108 @@ if not api_key:
 
 client = genai.Client(api_key=api_key)
 
+# Maximum number of videos analyzed at the same time (bounded by the API key's rate limit)
+ANALYSIS_CONCURRENCY = int(os.getenv("GEMINI_ANALYSIS_CONCURRENCY", "8"))
+
+# Retries for rate-limited (429) or overloaded (503) generate_content calls, with exponential backoff
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+RETRYABLE_STATUS_CODES = (429, 503)
+
+# Client-side cap on generate_content calls across all threads (sliding one-minute window)
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+_request_times = deque()
+_request_times_lock = threading.Lock()
+
+# Maps video SHA-256 -> Gemini file name so reruns can reuse earlier uploads
+UPLOAD_CACHE_PATH = Path(os.getenv("GEMINI_UPLOAD_CACHE", ".gemini_upload_cache.json"))
+_upload_cache_lock = threading.Lock()
+
+# Finished analyses keyed by video content + metadata hash, so reruns skip repeat Gemini calls
+ANALYSIS_CACHE_PATH = os.getenv("GEMINI_ANALYSIS_CACHE", ".gemini_analysis_cache.sqlite")
+_ANALYSIS_PROMPT_HASH = hashlib.sha256(VIDEO_ANALYSIS_PROMPT.encode("utf-8")).hexdigest()[:16]
+_analysis_cache_lock = threading.Lock()
+
 
 def extract_post_id(post_url: str) -> str:
     """Extract post ID from Instagram URL."""
+    # Shared links carry tracking query strings (e.g. ?igsh=...), which would otherwise miss the index
+    parts = post_url.split('?', 1)[0].split('#', 1)[0].rstrip('/').split('/')
     try:
-        parts = post_url.rstrip('/').split('/')
         if 'p' in parts:
             p_index = parts.index('p')
             return parts[p_index + 1]
     except (IndexError, ValueError):
         pass
-    return post_url.rstrip('/').split('/')[-1]
+    return parts[-1]
+
+
+def load_labeled_data(json_path: str) -> list:
+    """
+    Load labeled post data, using a Parquet copy of the JSON file when one is available.
+
+    The JSON file is parsed once and saved next to it as Parquet, which is much faster
+    to read on later runs. The Parquet copy is rebuilt whenever the JSON file is newer.
+
+    Args:
+        json_path: Path to labeled_scraped_data.json
+
+    Returns:
+        List of post dicts
+    """
+    json_file = Path(json_path)
+    # Versioned name: caches written before the columns were unified over all posts may be
+    # missing fields, so they are never read again
+    parquet_file = json_file.with_name(f"{json_file.stem}.v2.parquet")
+
+    if parquet_file.exists() and parquet_file.stat().st_mtime >= json_file.stat().st_mtime:
+        return pq.read_table(parquet_file).to_pylist()
+
+    with open(json_file, "rb") as f:
+        labeled_data = orjson.loads(f.read())
 
+    try:
+        # pa.Table.from_pylist would take the columns from the first post only and drop fields
+        # it lacks, so build one column per key seen in any post (None where missing)
+        keys = list(dict.fromkeys(key for post in labeled_data for key in post))
+        table = pa.Table.from_pydict({key: [post.get(key) for post in labeled_data] for key in keys})
+        pq.write_table(table, parquet_file)
+    except (pa.ArrowException, OSError) as e:
+        # Columns with mixed value types can't be stored as Parquet; keep using the JSON file
+        print(f"Warning: could not cache {json_path} as Parquet: {e}")
+        return labeled_data
+
+    # Same shape as a later cached read (missing fields as None), so the analysis cache keys
+    # built from this metadata match across runs
+    return table.to_pylist()
+
+
+def build_post_index(labeled_data: list) -> dict:
+    """
+    Index labeled posts by the post ID parsed from their URL.
+
+    If several posts share an ID, the first one wins.
+    """
+    post_index = {}
+    for post in labeled_data:
+        post_index.setdefault(extract_post_id(post.get("Post URL", "")), post)
+    return post_index
+
+
+def reservoir_sample(items, k: int) -> list:
+    """Uniformly sample up to k items from an iterable in one pass, holding only k at a time."""
+    sample = []
+    for seen, item in enumerate(items):
+        if seen < k:
+            sample.append(item)
+        else:
+            slot = random.randint(0, seen)
+            if slot < k:
+                sample[slot] = item
+    return sample
 
-def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = None, random_sample: bool = False) -> list:
+
+def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = None, random_sample: bool = False,
+                             post_index: dict = None) -> list:
     """
     Get video files and match them with performance data from labeled_scraped_data.json.
 
@@ -80,6 +134,8 @@ def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = No
         labeled_data: List of post data from labeled_scraped_data.json
         limit: Maximum number of videos to return
         random_sample: If True, randomly sample videos; if False, sort by views and take top N
+        post_index: Optional index from build_post_index, so callers scanning several
+                    directories parse every post URL only once
 
     Returns:
         List of dicts with 'video_path' and 'metadata' keys
@@ -89,40 +145,131 @@ def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = No
         print(f"Warning: {video_dir} does not exist")
         return []
 
-    video_files = list(video_path.glob("*.mp4"))
-    results = []
+    if post_index is None:
+        post_index = build_post_index(labeled_data)
+    def matched_videos():
+        # os.scandir reads file types from the directory entries instead of stat-ing every path
+        with os.scandir(video_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".mp4") or not entry.is_file():
+                    continue
+
+                # Video filename is the post ID (e.g., C8mtEPSp4b8.mp4)
+                post_id = entry.name[:-len(".mp4")]
+
+                # Find matching metadata in labeled data
+                metadata = post_index.get(post_id)
+
+                if metadata:
+                    yield {
+                        'video_path': entry.path,
+                        'post_id': post_id,
+                        'metadata': metadata
+                    }
+
+    # Matches are consumed as the directory is scanned, so with a limit only `limit` of them are held
+    if random_sample:
+        # Randomly sample videos
+        if limit:
+            return reservoir_sample(matched_videos(), limit)
+        return list(matched_videos())
 
-    for video_file in video_files:
-        # Video filename is the post ID (e.g., C8mtEPSp4b8.mp4)
-        post_id = video_file.stem
+    # Sort by views (descending) to get top performers
+    # Handle None values in Views field
+    views_key = lambda x: x['metadata'].get('Views') or 0
+    if limit:
+        # Partial selection is O(N log limit) instead of sorting every video
+        return heapq.nlargest(limit, matched_videos(), key=views_key)
+    return sorted(matched_videos(), key=views_key, reverse=True)
 
-        # Find matching metadata in labeled data
-        metadata = None
-        for post in labeled_data:
-            post_url = post.get("Post URL", "")
-            if post_id in post_url:
-                metadata = post
-                break
 
-        if metadata:
-            results.append({
-                'video_path': str(video_file),
-                'post_id': post_id,
-                'metadata': metadata
-            })
+def _file_sha256(path: str) -> str:
+    """Hash a file in 1MB chunks without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    if random_sample:
-        # Randomly sample videos
-        if limit and len(results) > limit:
-            results = random.sample(results, limit)
-    else:
-        # Sort by views (descending) to get top performers
-        # Handle None values in Views field
-        results.sort(key=lambda x: x['metadata'].get('Views') or 0, reverse=True)
-        if limit:
-            results = results[:limit]
 
-    return results
+def _load_upload_cache() -> dict:
+    if not UPLOAD_CACHE_PATH.exists():
+        return {}
+    return orjson.loads(UPLOAD_CACHE_PATH.read_bytes())
+
+
+def upload_video_file(video_path: str):
+    """
+    Upload a video to Gemini, reusing an earlier upload of the same file if the
+    server still has it.
+
+    Uploads are cached by file content hash, so reruns (or partial reruns after a
+    crash) skip re-sending videos that were already uploaded.
+
+    Returns:
+        The Gemini file handle for the video
+    """
+    file_hash = _file_sha256(video_path)
+
+    with _upload_cache_lock:
+        file_name = _load_upload_cache().get(file_hash)
+
+    if file_name:
+        try:
+            myfile = client.files.get(name=file_name)
+            if myfile.state != "FAILED":
+                print(f"  Reusing uploaded file {file_name}")
+                return myfile
+        except Exception:
+            # Uploaded files expire on the server; fall through and upload again
+            pass
+
+    myfile = client.files.upload(file=video_path)
+
+    with _upload_cache_lock:
+        cache = _load_upload_cache()
+        cache[file_hash] = myfile.name
+        UPLOAD_CACHE_PATH.write_bytes(orjson.dumps(cache))
+
+    return myfile
+
+
+def wait_for_request_slot():
+    """Block until another Gemini request fits under GEMINI_REQUESTS_PER_MINUTE."""
+    while True:
+        with _request_times_lock:
+            now = time.monotonic()
+            while _request_times and now - _request_times[0] >= 60:
+                _request_times.popleft()
+            if len(_request_times) < GEMINI_REQUESTS_PER_MINUTE:
+                _request_times.append(now)
+                return
+            wait_seconds = 60 - (now - _request_times[0])
+        time.sleep(wait_seconds)
+
+
+def generate_content_with_retry(contents: list, post_id: str, max_retries: int = GEMINI_MAX_RETRIES):
+    """
+    Call Gemini generate_content, backing off exponentially (with jitter) when the API
+    reports rate limiting or overload, so concurrent analyses don't fail on transient 429s.
+    """
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        wait_for_request_slot()
+        try:
+            return client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=contents,
+                config={
+                    'max_output_tokens': 8192,  # Ensure enough tokens for long responses
+                }
+            )
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                raise
+            print(f"  Gemini returned {e.code} for {post_id}, retrying in {delay:.1f}s...")
+            time.sleep(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, 30.0)
 
 
 def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
@@ -136,21 +283,18 @@ def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
 
     try:
         # Upload video for analysis
-        myfile = client.files.upload(file=video_path)
+        myfile = upload_video_file(video_path)
+        # Poll with exponential backoff so short clips aren't held up by a fixed 5s sleep
+        delay = 0.5
         while myfile.state == "PROCESSING":
             print(f"  Waiting for {post_id} to be processed...")
-            time.sleep(5)
+            time.sleep(delay)
+            delay = min(delay * 1.5, 5.0)
             myfile = client.files.get(name=myfile.name)
         print(f"  Video uploaded successfully: {myfile.state}")
 
         # Get video content analysis with proper configuration
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[myfile, VIDEO_ANALYSIS_PROMPT],
-            config={
-                'max_output_tokens': 8192,  # Ensure enough tokens for long responses
-            }
-        )
+        response = generate_content_with_retry([myfile, VIDEO_ANALYSIS_PROMPT], post_id)
 
         # Debug: Print response structure
         print(f"  Response received for {post_id}")
@@ -206,14 +350,14 @@ def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
 
     performance_context = f"""
 This video has the following performance metrics:
-- Is Viral: {metadata.get('viral', False)}
+- Is Viral: {metadata.get('viral') or False}
 - Views: {views:,.0f}
 - Likes: {likes:,}
 - Comments: {comments}
 - Duration: {duration} seconds
-- Caption: "{metadata.get('Captions', '')}"
+- Caption: "{metadata.get('Captions') or ''}"
 - Engagement Rate: {engagement_rate:.2f}%
-- Date Posted: {metadata.get('Date', '')}
+- Date Posted: {metadata.get('Date') or ''}
 
 Based on the video analysis above and these performance metrics, explain why this video {"went viral" if metadata.get('viral') else "did not go viral"}. What specific elements in the content, timing, format, or presentation contributed to its {"high" if metadata.get('viral') else "low"} engagement?
 
@@ -225,27 +369,26 @@ The transcript and scenes of the video is: {video_analysis}
     # Get virality analysis
     virality_analysis = None
     try:
-        virality_response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[performance_context],
-            config={
-                'max_output_tokens': 8192,
-            }
-        )
-
-        if virality_response:
-            try:
-                virality_analysis = virality_response.text
-                if virality_analysis:
-                    print(f"  ✓ Virality analysis generated ({len(virality_analysis)} chars)")
-                else:
-                    print(f"  ✗ virality_response.text is empty")
-                    virality_analysis = "Error: No virality analysis generated"
-            except Exception as text_error:
-                print(f"  ✗ Error accessing virality_response.text: {text_error}")
-                virality_analysis = f"Error accessing text: {text_error}"
+        if video_analysis.startswith("Error"):
+            # The follow-up would only explain an error message, so don't spend a generation on it
+            print(f"  Skipping virality analysis for {post_id}: video analysis failed")
+            virality_analysis = "Skipped: upstream analysis failed"
         else:
-            virality_analysis = "Error: No virality response from API"
+            virality_response = generate_content_with_retry([performance_context], post_id)
+
+            if virality_response:
+                try:
+                    virality_analysis = virality_response.text
+                    if virality_analysis:
+                        print(f"  ✓ Virality analysis generated ({len(virality_analysis)} chars)")
+                    else:
+                        print(f"  ✗ virality_response.text is empty")
+                        virality_analysis = "Error: No virality analysis generated"
+                except Exception as text_error:
+                    print(f"  ✗ Error accessing virality_response.text: {text_error}")
+                    virality_analysis = f"Error accessing text: {text_error}"
+            else:
+                virality_analysis = "Error: No virality response from API"
 
     except Exception as e:
         print(f"  ✗ ERROR during virality analysis for {post_id}: {str(e)}")
@@ -263,59 +406,112 @@ The transcript and scenes of the video is: {video_analysis}
     }
 
 
+def _analysis_cache_key(video_path: str, metadata: dict) -> str:
+    """
+    The analysis depends on the video, on the metadata quoted in the virality prompt and on
+    the analysis prompt, so editing the prompt invalidates earlier results.
+    """
+    metadata_hash = hashlib.sha256(orjson.dumps(metadata, default=str, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f"{_file_sha256(video_path)}:{metadata_hash}:{_ANALYSIS_PROMPT_HASH}"
+
+
+def _analysis_cache_execute(query: str, params: tuple) -> list:
+    with _analysis_cache_lock, sqlite3.connect(ANALYSIS_CACHE_PATH) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS analyses (key TEXT PRIMARY KEY, payload BLOB)")
+        return conn.execute(query, params).fetchall()
+
+
+def analyze_video_cached(video_path: str, metadata: dict, post_id: str) -> dict:
+    """
+    Same as analyze_video, but returns a stored result when this exact video and metadata
+    were analyzed before. Failed analyses are not stored, so they are retried next run.
+    """
+    key = _analysis_cache_key(video_path, metadata)
+    rows = _analysis_cache_execute("SELECT payload FROM analyses WHERE key = ?", (key,))
+    if rows:
+        print(f"Using cached analysis for {post_id}")
+        return {'post_id': post_id, 'video_path': video_path, 'metadata': metadata, **orjson.loads(rows[0][0])}
+
+    analysis = analyze_video(video_path, metadata, post_id)
+
+    cached_fields = {
+        field: analysis[field] for field in ('video_analysis', 'performance_context', 'virality_analysis')
+    }
+    if not any(str(value).startswith("Error") for value in cached_fields.values()):
+        _analysis_cache_execute(
+            "INSERT OR REPLACE INTO analyses (key, payload) VALUES (?, ?)", (key, orjson.dumps(cached_fields))
+        )
+    return analysis
+
+
+def analyze_videos(videos: list, output_path: str = None, max_workers: int = ANALYSIS_CONCURRENCY) -> list:
+    """
+    Analyze several videos concurrently using Gemini API.
+
+    Args:
+        videos: List of dicts from get_videos_with_metadata
+        output_path: Optional JSONL file; each analysis is appended as soon as it completes,
+                     so finished work survives a crash partway through the batch
+        max_workers: Maximum number of videos analyzed at the same time
+
+    Returns:
+        List of analysis dicts from analyze_video, in the same order as `videos`
+    """
+    output_file = open(output_path, "ab") if output_path else None
+    write_lock = threading.Lock()
+
+    def analyze_indexed(indexed_video):
+        idx, video_data = indexed_video
+        print(f"\n[{idx}/{len(videos)}] Processing {video_data['post_id']}...")
+        analysis = analyze_video_cached(
+            video_data['video_path'],
+            video_data['metadata'],
+            video_data['post_id']
+        )
+        if output_file:
+            line = orjson.dumps(analysis, default=str) + b"\n"
+            with write_lock:
+                output_file.write(line)
+                output_file.flush()
+        return analysis
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(analyze_indexed, enumerate(videos, 1)))
+    finally:
+        if output_file:
+            output_file.close()
+
+
 # Main execution
 print("Loading labeled data...")
-with open("./datasets/instagram/labeled_scraped_data.json", "r") as f:
-    labeled_data = json.load(f)
+labeled_data = load_labeled_data("./datasets/instagram/labeled_scraped_data.json")
+post_index = build_post_index(labeled_data)
 
 print("Getting viral videos (random sampling)...")
-viral_videos = get_videos_with_metadata("./datasets/instagram/viral", labeled_data, limit=5, random_sample=True)
+viral_videos = get_videos_with_metadata("./datasets/instagram/viral", labeled_data, limit=5, random_sample=True,
+                                        post_index=post_index)
 print(f"Found {len(viral_videos)} viral videos")
 
 print("Getting non-viral videos (random sampling)...")
-non_viral_videos = get_videos_with_metadata("./datasets/instagram/non_viral", labeled_data, limit=20, random_sample=True)
+non_viral_videos = get_videos_with_metadata("./datasets/instagram/non_viral", labeled_data, limit=20, random_sample=True,
+                                            post_index=post_index)
 print(f"Found {len(non_viral_videos)} non-viral videos")
 
+# Analyses are appended to JSONL files as each video completes
 # # # Analyze viral videos
 # print("\n" + "="*60)
 # print("ANALYZING VIRAL VIDEOS")
 # print("="*60)
-# viral_analyses = []
-# for idx, video_data in enumerate(viral_videos, 1):
-#     print(f"\n[{idx}/{len(viral_videos)}] Processing {video_data['post_id']}...")
-#     analysis = analyze_video(
-#         video_data['video_path'],
-#         video_data['metadata'],
-#         video_data['post_id']
-#     )
-#     viral_analyses.append(analysis)
+# viral_analyses = analyze_videos(viral_videos, output_path="./viral_video_analyses.jsonl")
+# print(f"Saved {len(viral_analyses)} viral analyses to viral_video_analyses.jsonl")
 
 # Analyze non-viral videos
 print("\n" + "="*60)
 print("ANALYZING NON-VIRAL VIDEOS")
 print("="*60)
-non_viral_analyses = []
-for idx, video_data in enumerate(non_viral_videos, 1):
-    print(f"\n[{idx}/{len(non_viral_videos)}] Processing {video_data['post_id']}...")
-    analysis = analyze_video(
-        video_data['video_path'],
-        video_data['metadata'],
-        video_data['post_id']
-    )
-    non_viral_analyses.append(analysis)
-
-# Save analyses to JSON files
-print("\n" + "="*60)
-print("SAVING ANALYSES")
-print("="*60)
-
-# with open("./viral_video_analyses.json", "w") as f:
-#     json.dump(viral_analyses, f, indent=2)
-# print(f"Saved {len(viral_analyses)} viral analyses to viral_video_analyses.json")
-
-with open("./non_viral_video_analyses.json", "w") as f:
-    json.dump(non_viral_analyses, f, indent=2)
-print(f"Saved {len(non_viral_analyses)} non-viral analyses to non_viral_video_analyses.json")
+non_viral_analyses = analyze_videos(non_viral_videos, output_path="./non_viral_video_analyses.jsonl")
+print(f"Saved {len(non_viral_analyses)} non-viral analyses to non_viral_video_analyses.jsonl")
 
 print("\n" + "="*60)
 print("ANALYSIS COMPLETE")
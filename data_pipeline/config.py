@@ -5,7 +5,7 @@ import os
 import json
 from pathlib import Path
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -46,6 +46,8 @@ class DatabricksConfig:
     token: str
     catalog: str
     schema: str
+    staging_volume: Optional[str] = None  # UC Volume used to stage Parquet files for COPY INTO
+    upload_concurrency: int = 8  # INSERT statements in flight at once on the fallback upload path
     
     @property
     def url(self) -> str:
@@ -56,7 +58,9 @@ DATABRICKS_CONFIG = DatabricksConfig(
     host=os.getenv("DATABRICKS_HOST"),
     token=os.getenv("DATABRICKS_TOKEN"),
     catalog=os.getenv("DATABRICKS_CATALOG", "main"), # Use a default if not set
-    schema=os.getenv("DATABRICKS_SCHEMA", "viral_analytics") # Use a default if not set
+    schema=os.getenv("DATABRICKS_SCHEMA", "viral_analytics"), # Use a default if not set
+    staging_volume=os.getenv("DATABRICKS_STAGING_VOLUME"), # Enables COPY INTO uploads when set
+    upload_concurrency=int(os.getenv("DATABRICKS_UPLOAD_CONCURRENCY", "8"))
 )
 
 # Sanity Check for Databricks
@@ -1,34 +1,312 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from databricks import sql
 from config import DatabricksConfig, DATABRICKS_CONFIG
 import logging
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import uuid
+from contextlib import contextmanager
+
+# Delta column types for the pandas dtypes we upload; anything else is stored as STRING
+PANDAS_TO_DELTA_TYPES = {
+    "int64": "BIGINT",
+    "int32": "INT",
+    "int16": "SMALLINT",
+    "int8": "TINYINT",
+    "float64": "DOUBLE",
+    "float32": "FLOAT",
+    "object": "STRING",
+    "bool": "BOOLEAN",
+    # pandas nullable extension dtypes
+    "Int64": "BIGINT",
+    "Int32": "INT",
+    "Float64": "DOUBLE",
+    "boolean": "BOOLEAN",
+    "string": "STRING",
+}
+
+# Frames smaller than this skip Parquet staging; a few INSERTs beat the PUT/COPY/REMOVE round-trips
+COPY_INTO_MIN_ROWS = int(os.getenv("DATABRICKS_COPY_INTO_MIN_ROWS", "1000"))
+
+# Large frames are staged as one Parquet part file per this many rows, up to MAX_PARQUET_PARTITIONS
+PARQUET_PARTITION_ROWS = 250_000
+MAX_PARQUET_PARTITIONS = 32
+
+# Databricks caps bound parameters per statement; multi-row INSERTs are sized to stay under it
+MAX_INSERT_PARAMETERS = int(os.getenv("DATABRICKS_MAX_INSERT_PARAMETERS", "256"))
+
+# Cached connections idle for longer than this are health-checked before being reused
+CONNECTION_STALE_SECONDS = 300
+
+# Connections older than this are closed instead of reused, so sessions and tokens get refreshed
+CONNECTION_MAX_AGE_SECONDS = int(os.getenv("DATABRICKS_CONNECTION_TTL", "600"))
+
+# Idle connections kept for reuse; extras opened during concurrent uploads are closed on return
+MAX_IDLE_CONNECTIONS = 8
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a DataFrame to an Arrow table for upload.
+
+    Object columns may hold mixed Python values (dicts, lists, numbers) that Arrow cannot
+    store in one column, so they are converted to strings to match their STRING columns.
+    Object columns that already hold only strings, and typed columns, are converted straight
+    from their arrays.
+    """
+    mixed_columns = [
+        col for col in df.select_dtypes(include="object").columns
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty")
+    ]
+    staged_df = df.assign(**{
+        col: df[col].astype(str).where(df[col].notna(), None) for col in mixed_columns
+    })
+    return pa.Table.from_pandas(staged_df, preserve_index=False)
+
+def _delta_type(dtype) -> str:
+    """Maps a pandas dtype to the Delta column type used when creating the table."""
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return PANDAS_TO_DELTA_TYPES.get(dtype.name, "STRING")
 
 class DatabricksService:
     """Service to connect and upload data to Databricks."""
+    # (host, table) pairs known to exist, shared by every instance so new services in the
+    # same process skip the CREATE TABLE round trip too; cleared per table on overwrite/failure
+    _known_tables = set()
+
     def __init__(self, config: DatabricksConfig):
         self.config = config
         self.table_prefix = f"{config.catalog}.{config.schema}"
         self.logger = logging.getLogger("DatabricksService")
+        # Backtick-quoted `catalog`.`schema`.`table` names, built once per table
+        self._qualified_names = {}
+        self._insert_templates = {}  # (table, columns) -> prebuilt multi-row INSERT statement parts
 
-    def _get_connection(self):
+        # Idle connections kept open for reuse, as (connection, opened_at, last_used) triples
+        self._idle_connections = []
+        self._conn_lock = threading.Lock()
+        # Local directory that PUT/REMOVE may read from; fixed per service so connections can be reused
+        self._staging_dir = tempfile.TemporaryDirectory(prefix="databricks_staging_")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _qualified_name(self, table_name: str) -> str:
+        """Returns the fully qualified, quoted name of a table in the configured catalog and schema."""
+        full_table_name = self._qualified_names.get(table_name)
+        if full_table_name is None:
+            full_table_name = f"`{self.config.catalog}`.`{self.config.schema}`.`{table_name}`"
+            self._qualified_names[table_name] = full_table_name
+        return full_table_name
+
+    def _connect(self):
         """Establishes a connection to the Databricks SQL endpoint."""
         return sql.connect(
             server_hostname=self.config.host,
             http_path=f"/sql/1.0/warehouses/{os.getenv('DATABRICKS_WAREHOUSE_ID')}", # Warehouse ID is often required
             access_token=self.config.token,
             catalog=self.config.catalog,
-            schema=self.config.schema
+            schema=self.config.schema,
+            staging_allowed_local_path=self._staging_dir.name # Required for PUT/REMOVE on Volumes
         )
 
+    def _is_usable(self, connection, opened_at: float, last_used: float) -> bool:
+        """
+        Checks that a cached connection is still open and within its TTL, pinging it if it
+        has been idle for a while.
+        """
+        now = time.monotonic()
+        if not connection.open or now - opened_at >= CONNECTION_MAX_AGE_SECONDS:
+            return False
+        if now - last_used < CONNECTION_STALE_SECONDS:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def _get_connection(self):
+        """
+        Checks out a cached connection, opening a new one only when none is idle, and
+        returns it to the cache afterwards. This avoids paying the TLS handshake and
+        warehouse session setup on every call. Connections are never shared between
+        threads at the same time.
+        """
+        connection = None
+        while connection is None:
+            with self._conn_lock:
+                if not self._idle_connections:
+                    break
+                candidate, opened_at, last_used = self._idle_connections.pop()
+            if self._is_usable(candidate, opened_at, last_used):
+                connection = candidate
+            else:
+                self._close_quietly(candidate)
+
+        if connection is None:
+            connection = self._connect()
+            opened_at = time.monotonic()
+
+        try:
+            yield connection
+        except Exception:
+            # The connection may be in a bad state, so don't hand it out again
+            self._close_quietly(connection)
+            raise
+
+        with self._conn_lock:
+            keep = len(self._idle_connections) < MAX_IDLE_CONNECTIONS
+            if keep:
+                self._idle_connections.append((connection, opened_at, time.monotonic()))
+        if not keep:
+            self._close_quietly(connection)
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception as e:
+            self.logger.debug(f"Ignoring error while closing connection: {e}")
+
+    def close(self):
+        """Closes all cached connections and removes the local staging directory."""
+        with self._conn_lock:
+            connections, self._idle_connections = self._idle_connections, []
+        for connection, _, _ in connections:
+            self._close_quietly(connection)
+        self._staging_dir.cleanup()
+
+    def _copy_into(self, cursor, df: pd.DataFrame, full_table_name: str):
+        """
+        Bulk loads a DataFrame by staging it as Parquet in a Unity Catalog Volume and issuing
+        a single COPY INTO, instead of one INSERT round trip per row. Large frames are split
+        into several part files that are written and uploaded concurrently; COPY INTO then
+        loads the whole staging directory in one statement.
+        """
+        table = _to_arrow(df)
+        num_partitions = min(MAX_PARQUET_PARTITIONS, max(1, table.num_rows // PARQUET_PARTITION_ROWS))
+        rows_per_partition = -(-table.num_rows // num_partitions)
+        batch_id = uuid.uuid4().hex
+        volume_dir = f"/Volumes/{self.config.catalog}/{self.config.schema}/{self.config.staging_volume}/{batch_id}"
+        staged_paths = []
+
+        def stage(part_index: int):
+            file_name = f"part-{part_index:04d}.parquet"
+            local_path = os.path.join(self._staging_dir.name, f"{batch_id}-{file_name}")
+            volume_path = f"{volume_dir}/{file_name}"
+
+            # zstd dictionary encoding shrinks the string-heavy scrape columns well below snappy
+            pq.write_table(
+                table.slice(part_index * rows_per_partition, rows_per_partition), local_path,
+                compression="zstd", compression_level=3, use_dictionary=True, row_group_size=50_000
+            )
+            try:
+                put_query = f"PUT '{local_path}' INTO '{volume_path}' OVERWRITE"
+                if num_partitions == 1:
+                    cursor.execute(put_query)
+                else:
+                    # Each part uploads over its own pooled connection
+                    self._execute_statement(put_query)
+                staged_paths.append(volume_path)
+            finally:
+                os.remove(local_path)
+
+        try:
+            if num_partitions == 1:
+                stage(0)
+            else:
+                # pyarrow releases the GIL while encoding, so parts are written in parallel too
+                with ThreadPoolExecutor(max_workers=num_partitions) as executor:
+                    list(executor.map(stage, range(num_partitions)))
+
+            cursor.execute(
+                f"COPY INTO {full_table_name} FROM '{volume_dir}' FILEFORMAT = PARQUET "
+                "FORMAT_OPTIONS ('mergeSchema' = 'true') COPY_OPTIONS ('mergeSchema' = 'true')"
+            )
+        finally:
+            for volume_path in staged_paths:
+                cursor.execute(f"REMOVE '{volume_path}'")
+
+    def _insert_rows(self, cursor, df: pd.DataFrame, full_table_name: str):
+        """
+        Inserts the DataFrame with multi-row `INSERT ... VALUES (...), (...)` statements, each
+        carrying as many rows as fit under MAX_INSERT_PARAMETERS, so a round-trip moves a
+        whole chunk instead of a single record.
+        """
+        template_key = (full_table_name, tuple(df.columns))
+        template = self._insert_templates.get(template_key)
+        if template is None:
+            # Statement text depends only on the table and columns, so build it once per shape
+            columns = ", ".join([f"`{col}`" for col in df.columns])
+            row_placeholder = "(" + ", ".join(["%s"] * len(df.columns)) + ")"
+            rows_per_stmt = max(1, MAX_INSERT_PARAMETERS // len(df.columns))
+            query_prefix = f"INSERT INTO {full_table_name} ({columns}) VALUES "
+            full_chunk_query = query_prefix + ", ".join([row_placeholder] * rows_per_stmt)
+            template = (query_prefix, row_placeholder, rows_per_stmt, full_chunk_query)
+            self._insert_templates[template_key] = template
+        query_prefix, row_placeholder, rows_per_stmt, full_chunk_query = template
+
+        def insert_query(n_rows):
+            return query_prefix + ", ".join([row_placeholder] * n_rows)
+
+        # Not cursor.executemany: the connector implements it as one execute() per parameter
+        # set, i.e. one round trip per row, whereas each statement here carries a whole chunk.
+        # Statements are generated lazily from Arrow record batches so only the chunks in
+        # flight exist as Python objects, never the whole frame.
+        def iter_statements():
+            # Arrow converts each column to Python values in C, with NaN/NaT becoming None (NULL)
+            for batch in _to_arrow(df).to_batches(max_chunksize=rows_per_stmt):
+                query = full_chunk_query if batch.num_rows == rows_per_stmt else insert_query(batch.num_rows)
+                rows = zip(*[column.to_pylist() for column in batch.columns])
+                yield query, [value for row in rows for value in row]
+
+        n_statements = -(-len(df) // rows_per_stmt)
+        workers = min(self.config.upload_concurrency, n_statements)
+        if workers <= 1:
+            for query, params in iter_statements():
+                cursor.execute(query, params)
+            return
+
+        # Each worker checks out its own pooled connection, so chunks execute server-side in
+        # parallel; Delta appends from separate connections do not conflict with each other.
+        # Submission is bounded so statements are built only slightly ahead of the workers.
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for statement in iter_statements():
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(self._execute_statement, *statement))
+            for future in pending:
+                future.result()
+
+    def _execute_statement(self, query: str, params: list = None):
+        """Runs one statement on a connection checked out from the pool."""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+
     def upload_dataframe(self, df: pd.DataFrame, table_name: str, mode: str = "append"):
         """
         Uploads a Pandas DataFrame to a Databricks Unity Catalog table.
-        NOTE: This implementation uses a simple INSERT query via the SQL connector,
-        which is slow for large datasets. For production, consider using Databricks
-        Delta Lake APIs (e.g., spark.createDataFrame) or CSV/Parquet upload.
+        NOTE: When `staging_volume` is configured, the DataFrame is staged as Parquet in that
+        Volume and loaded with a single COPY INTO. Frames under COPY_INTO_MIN_ROWS, or any
+        frame when no Volume is configured, fall back to multi-row INSERTs via the SQL connector,
+        which is slow for large datasets.
         """
-        full_table_name = f"`{self.config.catalog}`.`{self.config.schema}`.`{table_name}`"
+        full_table_name = self._qualified_name(table_name)
+        table_key = (self.config.host, full_table_name)
         self.logger.info(f"Attempting to upload {len(df)} rows to {full_table_name} (Mode: {mode})...")
 
         if df.empty:
@@ -41,40 +319,37 @@ class DatabricksService:
                     # 1. Handle Overwrite/Create
                     if mode == "overwrite":
                         cursor.execute(f"DROP TABLE IF EXISTS {full_table_name}")
+                        self._known_tables.discard(table_key)
                         self.logger.info(f"Dropped existing table {full_table_name}.")
 
-                    # Use pandas to_sql for simpler upload if available/configured, 
-                    # but since we are using databricks-sql-connector, we do it manually:
-                    
-                    # For simplicity, we just check if table exists and append/fail
-                    # A robust implementation would use a client library for efficient bulk loading.
-                    
-                    self.logger.warning("Using slow row-by-row insertion. Optimize for production.")
-                    
-                    # Example of a single row insertion for minimal implementation
-                    columns = ", ".join([f"`{col}`" for col in df.columns])
-                    placeholders = ", ".join(["%s"] * len(df.columns))
-                    insert_query = f"INSERT INTO {full_table_name} ({columns}) VALUES ({placeholders})"
-
-                    # Convert DataFrame to a list of tuples
-                    rows = [tuple(row) for row in df.values]
-                    
-                    # Create table if it doesn't exist (simplistic schema inference)
-                    schema_def = ", ".join([f"`{col}` STRING" for col in df.columns])
-                    create_table_query = f"CREATE TABLE IF NOT EXISTS {full_table_name} ({schema_def}) USING DELTA"
-                    cursor.execute(create_table_query)
-                    
-                    # Execute batch insert
-                    # NOTE: databricks-sql-connector may not support executemany on all endpoints.
-                    # This is a conceptual implementation.
-                    for row in rows:
-                        cursor.execute(insert_query, row)
-                    
+                    # Create table if it doesn't exist, typed from the DataFrame dtypes. Repeat
+                    # appends to a table created earlier skip this DDL round trip.
+                    if table_key not in self._known_tables:
+                        schema_def = ", ".join(
+                            [f"`{col}` {_delta_type(dtype)}" for col, dtype in df.dtypes.items()]
+                        )
+                        create_table_query = f"CREATE TABLE IF NOT EXISTS {full_table_name} ({schema_def}) USING DELTA"
+                        cursor.execute(create_table_query)
+                        self._known_tables.add(table_key)
+
+                    # 2. Bulk load through a staged Parquet file when a Volume is available
+                    if self.config.staging_volume and len(df) >= COPY_INTO_MIN_ROWS:
+                        self._copy_into(cursor, df, full_table_name)
+                    else:
+                        if not self.config.staging_volume:
+                            self.logger.warning(
+                                "Using batched INSERTs. Set DATABRICKS_STAGING_VOLUME to enable COPY INTO."
+                            )
+
+                        self._insert_rows(cursor, df, full_table_name)
+
                     connection.commit()
                     self.logger.info(f"✅ Successfully uploaded {len(df)} records to Databricks table {full_table_name}.")
 
         except Exception as e:
             self.logger.error(f"❌ Failed to upload DataFrame to Databricks table {table_name}: {e}")
+            # The table may have been dropped elsewhere; re-check it on the next upload
+            self._known_tables.discard(table_key)
             raise
 
 
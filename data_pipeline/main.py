@@ -2,13 +2,17 @@
 
 import sys
 import logging
-import json
+import mmap
+import orjson
 import subprocess
 import pandas as pd
+import pyarrow as pa
 import os
 import time
 from pathlib import Path
 from datetime import datetime
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from typing import List
 from config import ScrapingConfig, IG_REEL_SCRAPING_CONFIG, DatabricksConfig, DATABRICKS_CONFIG
 from data_scraper import DataScraper
@@ -16,27 +20,30 @@ from scraping_result import ScrapingResult
 from video_processor import process_dataframe
 from label_data_as_viral import get_top_engagement_from_both 
 from s3_service import S3Service
-from service import analyze_video 
+from service import analyze_video_cached, ANALYSIS_CONCURRENCY
 from databricks_service import DatabricksService 
+from post_ids import extract_post_ids
 
 # TO BE IMPLEMENTED
 from hypothesis_engine import HypothesisEngine # Assuming this is where your HypothesisEngine class resides
 
-def extract_post_id_from_url(url: str) -> str:
-    """Extract post ID (shortcode) from Instagram URL."""
-    # Example: https://www.instagram.com/reel/C8mtEPSp4b8/
+# Labeled-post fields used downstream: download/labeling, the Gemini prompt and the hypothesis metrics
+LABELED_COLUMNS = ['Post URL', 'viral', 'Views', 'Likes', 'Comments', 'Video Duration', 'Captions', 'Date']
+
+def load_labeled_frame(labeled_data: list) -> pd.DataFrame:
+    """
+    Build the labeled DataFrame with only LABELED_COLUMNS, via Arrow so the other scraped
+    fields are never materialized as pandas object columns.
+    Columns come from every record (None where missing), not just the first one as
+    pa.Table.from_pylist would infer.
+    """
+    columns = [col for col in LABELED_COLUMNS if any(col in post for post in labeled_data)]
     try:
-        # Split by '/', filter out empty strings, get the second-to-last element
-        parts = url.rstrip('/').split('/')
-        # It's usually the second-to-last part for post URLs, but handling 'p' path in case
-        if 'p' in parts:
-            p_index = parts.index('p')
-            return parts[p_index + 1] if len(parts) > p_index + 1 else parts[-1]
-        
-        post_id = parts[-1] if parts[-1] else parts[-2]
-        return post_id
-    except:
-        return None
+        table = pa.Table.from_pydict({col: [post.get(col) for post in labeled_data] for col in columns})
+    except (pa.ArrowException, ValueError):
+        # Fields with mixed types across records can't share an Arrow column
+        return pd.DataFrame(labeled_data, columns=columns)
+    return table.to_pandas()
 
 # Setup logging
 logging.basicConfig(
@@ -63,9 +70,17 @@ def main():
     scraped_df = ig_posts.to_pandas()
     
     os.makedirs("datasets/instagram", exist_ok=True)
+    # The viral labeler reads the scraped posts from this Excel file
     scraped_excel = f"datasets/instagram/cat_data_{timestamp}.xlsx"
     scraped_df.to_excel(scraped_excel, index=False)
     logger.info(f"💾 Saved scraped data: {scraped_excel} ({len(scraped_df)} posts)")
+    # Columnar copy for readers that don't need Excel
+    scraped_parquet = scraped_excel.replace(".xlsx", ".parquet")
+    try:
+        scraped_df.to_parquet(scraped_parquet, engine="pyarrow", compression="zstd", index=False)
+        logger.info(f"💾 Saved scraped data: {scraped_parquet}")
+    except (pa.ArrowException, ValueError) as e:
+        logger.warning(f"⚠️ Could not write Parquet copy of scraped data: {e}")
 
     # ==================== STEP 2: LABEL DATA & INITIAL MERGE ====================
     logger.info("\n" + "=" * 70)
@@ -90,9 +105,11 @@ def main():
         logger.error(f"❌ Labeled data file not found at {labeled_json_path}. Exiting.")
         sys.exit(1)
         
-    with open(labeled_json_path, "r", encoding="utf-8") as f:
-        labeled_data = json.load(f)
-    labeled_df = pd.DataFrame(labeled_data)
+    # Parse straight from the mapped file instead of reading a copy into memory
+    with open(labeled_json_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            labeled_data = orjson.loads(view)
+    labeled_df = load_labeled_frame(labeled_data)
     logger.info(f"✅ Loaded labeled data with {len(labeled_df)} records")
 
     # ==================== STEP 3: UPLOAD MEDIA TO S3 (Instaloader/Video Processor) ====================
@@ -104,9 +121,9 @@ def main():
     process_dataframe(labeled_df, "Post URL")
     logger.info("✅ Media uploaded to S3")
 
-    # ==================== STEP 4: DOWNLOAD FROM S3 & ORGANIZE (for Gemini LLM) ====================
+    # ==================== STEP 4-5: STREAM S3 DOWNLOADS INTO GEMINI LLM VIDEO ANALYSIS (Cat Data) ====================
     logger.info("\n" + "=" * 70)
-    logger.info("STEP 4: DOWNLOADING FROM S3 & ORGANIZING LOCALLY")
+    logger.info("STEP 4-5: DOWNLOADING FROM S3 & GEMINI LLM VIDEO ANALYSIS (CAT DATA)")
     logger.info("=" * 70)
     
     s3_service = S3Service()
@@ -114,73 +131,143 @@ def main():
     s3_service.delete_local_downloads(download_base_dir)
 
     # Prepare for download
-    labeled_df['post_id'] = labeled_df['Post URL'].apply(extract_post_id_from_url)
-    viral_post_ids = labeled_df[labeled_df.get('viral', False) == True]['post_id'].dropna().tolist()
-    non_viral_post_ids = labeled_df[labeled_df.get('viral', False) == False]['post_id'].dropna().tolist()
+    labeled_df['post_id'] = extract_post_ids(labeled_df['Post URL'])
+    # One grouping pass. The labeler emits 0/1 ints, so labels are cast to bool; posts with no
+    # label (or no 'viral' column at all) count as non-viral
+    if 'viral' in labeled_df.columns:
+        viral_labels = labeled_df['viral'].fillna(False).astype(bool)
+    else:
+        viral_labels = pd.Series(False, index=labeled_df.index)
+    has_post_id = labeled_df['post_id'].notna()
+    post_id_groups = labeled_df.loc[has_post_id, 'post_id'].groupby(viral_labels[has_post_id]).agg(list)
+    viral_post_ids = post_id_groups.get(True, [])
+    non_viral_post_ids = post_id_groups.get(False, [])
     
     logger.info(f"📊 Viral posts: {len(viral_post_ids)}, Non-viral posts: {len(non_viral_post_ids)}")
     
-    # Download videos in batches
-    logger.info("⬇️ Downloading viral and non-viral videos...")
-    viral_downloaded = s3_service.download_batch(viral_post_ids, os.path.join(download_base_dir, "viral"))
-    non_viral_downloaded = s3_service.download_batch(non_viral_post_ids, os.path.join(download_base_dir, "non_viral"))
-    
-    all_downloaded_posts = {**viral_downloaded, **non_viral_downloaded}
-    
-    # Update DataFrame with local file paths and filter
-    labeled_df['local_video_path'] = labeled_df['post_id'].map(all_downloaded_posts)
-    llm_input_df = labeled_df.dropna(subset=['local_video_path']).copy()
-    
-    logger.info(f"✅ Ready for LLM analysis: {len(llm_input_df)} posts with local video files.")
-
-    # ==================== STEP 5: GEMINI LLM VIDEO ANALYSIS (Cat Data) ====================
-    logger.info("\n" + "=" * 70)
-    logger.info("STEP 5: GEMINI LLM VIDEO ANALYSIS (CAT DATA)")
-    logger.info("=" * 70)
+    # Metadata for each post, so a video can be analyzed as soon as its download finishes
+    post_records = {}
+    for record in labeled_df.to_dict('records'):
+        post_records.setdefault(record['post_id'], record)
     
-    all_video_analysis = []
+    # Each video is analyzed while later ones are still downloading, then deleted right away
+    # Both classes share one download window and directory; the viral flag stays in labeled_df
+    logger.info("⬇️ Streaming viral and non-viral videos into analysis...")
+    # A post scraped twice would be downloaded and analyzed twice, so keep each id once
+    post_ids_to_download = list(dict.fromkeys(viral_post_ids + non_viral_post_ids))
+    downloads = s3_service.iter_download(post_ids_to_download, download_base_dir)
     
-    for index, row in llm_input_df.iterrows():
-        post_id = row['post_id']
-        video_path = row['local_video_path']
-        post_metadata = row.to_dict()
+    def analyze_downloaded(post_id: str, video_path: str):
+        post_metadata = {**post_records[post_id], 'local_video_path': video_path}
         
         try:
             logger.info(f"🧠 Analyzing video: {post_id}")
             
-            # Call analyze_video from service.py
-            analysis_results_dict = analyze_video(video_path, post_metadata, post_id)
+            # Call analyze_video from service.py, reusing results from earlier runs
+            analysis_results_dict = analyze_video_cached(video_path, post_metadata, post_id)
             
+            errors = [
+                field for field in ('video_analysis', 'performance_context', 'virality_analysis')
+                if str(analysis_results_dict.get(field)).startswith("Error")
+            ]
+            if not errors:
+                logger.info(f"✅ Analysis complete for {post_id}")
+            failure = f"Gemini error in {', '.join(errors)}" if errors else None
             # Extract the required fields from the service.py output
-            result_row = {
+            return post_id, failure, {
                 'post_id': post_id,
-                'Post URL': row['Post URL'],
+                'Post URL': post_metadata['Post URL'],
                 # Capture the three required fields
                 'video_analysis': analysis_results_dict.get('video_analysis'),
                 'performance_context': analysis_results_dict.get('performance_context'),
                 'virality_analysis': analysis_results_dict.get('virality_analysis')
             }
             
-            all_video_analysis.append(result_row)
-            logger.info(f"✅ Analysis complete for {post_id}")
-            
         except Exception as e:
-            logger.error(f"❌ Failed LLM analysis for post {post_id}: {e}")
+            # Reported in aggregate once the batch finishes
+            logger.debug(f"Failed LLM analysis for post {post_id}: {e}")
+            return post_id, type(e).__name__, None
+        finally:
+            try:
+                os.unlink(video_path)
+            except FileNotFoundError:
+                # Already removed; a missing temp file must not abort the run
+                pass
+    
+    all_downloaded_posts = {}
+    all_video_analysis = []
+    failed_posts = []
+    
+    # Circuit breaker: failures cluster when Gemini is throttled or down, so when too many of
+    # the recent analyses failed, pause new submissions instead of retrying straight into it
+    recent_failures = deque(maxlen=20)
+    breaker_backoff = 15.0
+    
+    def collect(futures):
+        for future in futures:
+            post_id, failure, result_row = future.result()
+            recent_failures.append(failure is not None)
+            if failure:
+                failed_posts.append((post_id, failure))
+            if result_row:
+                all_video_analysis.append(result_row)
+    
+    # Gemini calls are network-bound, so several videos are analyzed at once. A new download is
+    # only taken once an analysis slot frees up, keeping the number of videos on disk bounded.
+    try:
+        with ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY) as executor:
+            pending = set()
+            for post_id, video_path in downloads:
+                if sum(recent_failures) > 4:
+                    logger.warning(f"⏸️ {sum(recent_failures)} of the last {len(recent_failures)} analyses failed, pausing {breaker_backoff:.0f}s")
+                    time.sleep(breaker_backoff)
+                    breaker_backoff = min(breaker_backoff * 2, 300.0)
+                    recent_failures.clear()
+                all_downloaded_posts[post_id] = video_path
+                pending.add(executor.submit(analyze_downloaded, post_id, video_path))
+                if len(pending) >= ANALYSIS_CONCURRENCY:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(as_completed(pending))
+    finally:
+        # Videos are deleted as they are analyzed; this removes the directories and any leftovers
+        s3_service.delete_local_downloads(download_base_dir)
+    
+    # Update DataFrame with local file paths and filter
+    labeled_df['local_video_path'] = labeled_df['post_id'].map(all_downloaded_posts)
+    llm_input_df = labeled_df.dropna(subset=['local_video_path']).copy()
+    
+    logger.info(f"✅ Analyzed {len(all_video_analysis)}/{len(llm_input_df)} posts with downloaded video files.")
+    if failed_posts:
+        failure_counts = Counter(reason for _, reason in failed_posts)
+        logger.error(f"❌ {len(failed_posts)} analyses failed: {dict(failure_counts)}")
+        logger.error(f"❌ Failed post IDs: {[post_id for post_id, _ in failed_posts]}")
             
-    analysis_df = pd.DataFrame(all_video_analysis)
+    llm_columns = ['video_analysis', 'performance_context', 'virality_analysis']
+    analysis_df = pd.DataFrame(all_video_analysis, columns=['post_id', 'Post URL', *llm_columns])
+    analysis_by_post = analysis_df.set_index('post_id')
     
-    # Merge LLM analysis back into the main scraped dataset
-    # Drop existing LLM-related columns before merge if they somehow existed
-    cols_to_drop = ['video_analysis', 'performance_context', 'virality_analysis']
-    llm_enriched_df = pd.merge(llm_input_df.drop(columns=cols_to_drop, errors='ignore'), 
-                                 analysis_df, 
-                                 on=['Post URL', 'post_id'], 
-                                 how='inner')
+    # Attach LLM analysis to the main scraped dataset. Each post_id is analyzed once, so
+    # mapping the columns by post_id replaces a two-key merge; posts without analysis are dropped
+    llm_enriched_df = llm_input_df[llm_input_df['post_id'].isin(analysis_by_post.index)].copy()
+    for col in llm_columns:
+        llm_enriched_df[col] = llm_enriched_df['post_id'].map(analysis_by_post[col])
     
     # Save the enriched data
-    final_output_path = f"datasets/instagram/llm_enriched_cat_data_{timestamp}.xlsx"
-    llm_enriched_df.to_excel(final_output_path, index=False)
-    logger.info(f"💾 Saved LLM-enriched CAT data: {final_output_path} ({len(llm_enriched_df)} records)")
+    # Parquet is written column-at-a-time by Arrow; the Excel copy is opt-in for manual review
+    final_output_path = f"datasets/instagram/llm_enriched_cat_data_{timestamp}.parquet"
+    final_excel_path = final_output_path.replace(".parquet", ".xlsx")
+    write_excel = os.getenv("WRITE_XLSX", "0") == "1"
+    try:
+        llm_enriched_df.to_parquet(final_output_path, engine="pyarrow", compression="zstd", index=False)
+        logger.info(f"💾 Saved LLM-enriched CAT data: {final_output_path} ({len(llm_enriched_df)} records)")
+    except (pa.ArrowException, ValueError) as e:
+        # Columns with mixed value types can't be stored as Parquet; Excel keeps the analyses
+        logger.warning(f"⚠️ Could not write Parquet copy of LLM-enriched data, saving Excel instead: {e}")
+        write_excel = True
+    if write_excel:
+        llm_enriched_df.to_excel(final_excel_path, index=False)
+        logger.info(f"💾 Saved Excel copy: {final_excel_path}")
     
     
     # ==================== STEP 6: HYPOTHESIS GENERATION (Cat Data) ====================
@@ -211,69 +298,49 @@ def main():
         "ad_format_suggestions": ad_suggestions
     }
     
-    # ==================== STEP 7: CLEANUP & NEXT STEPS ====================
+    # ==================== NEXT STEPS ====================
     # The next step would be to load the Ad Data, run LLM analysis on it, 
     # and use CAT_HYPOTHESIS_JSON as input to the Ad Data Hypothesis Engine.
     logger.info("\n" + "=" * 70)
     logger.info("NEXT STEP: Ad Data LLM Analysis & Hypothesis Generation, using Cat Data Hypotheses as input.")
     logger.info("=" * 70)
     
-    # Final cleanup of local video files
-    s3_service.delete_local_downloads(download_base_dir)
-
-    # Package and save the Cat Data Hypothesis results
-    cat_hypotheses_output = {
-        "timestamp": timestamp,
-        "source": "Scraped Cat Content",
-        "comparative_observations": comparative_report,
-        "cross_category_hypotheses": hypotheses,
-        "ad_format_suggestions": ad_suggestions
-    }
-
-    CAT_HYPOTHESIS_JSON = "cat_data_hypotheses.json"
-    with open(CAT_HYPOTHESIS_JSON, "w") as f:
-        json.dump(cat_hypotheses_output, f, indent=4)
+    with open(CAT_HYPOTHESIS_JSON, "wb") as f:
+        f.write(orjson.dumps(cat_hypotheses_output, option=orjson.OPT_INDENT_2))
     logger.info(f"💾 Saved CAT data hypotheses as input for Ad data analysis: {CAT_HYPOTHESIS_JSON}")
     
     
-    # ==================== STEP 7: DATABRICKS UPLOAD & CLEANUP ====================
+    # ==================== STEP 7: DATABRICKS UPLOAD ====================
     logger.info("\n" + "=" * 70)
-    logger.info("STEP 7: UPLOADING DATA TO DATABRICKS & CLEANUP")
+    logger.info("STEP 7: UPLOADING DATA TO DATABRICKS")
     logger.info("=" * 70)
     
-    s3_service = S3Service()
-    download_base_dir = "datasets/instagram/temp_llm_input"
-    
     try:
         # Initialize Databricks Service using config
         db_service = DatabricksService(config=DATABRICKS_CONFIG)
         
-        # 1. Upload the LLM-enriched DataFrame
-        db_service.upload_dataframe(
-            df=llm_enriched_df, 
-            table_name="llm_enriched_cat_content", 
-            mode="append" # Use 'overwrite' if you want to replace the table every run
-        )
-        
-        # 2. Upload the Hypothesis results (convert the JSON structure to a small DataFrame)
+        # Upload the Hypothesis results (convert the JSON structure to a small DataFrame)
         hypotheses_df = pd.DataFrame([
             {"timestamp": timestamp, 
              "source": "cat_content", 
-             "hypotheses_json": json.dumps(cat_hypotheses_output)}
+             "hypotheses_json": orjson.dumps(cat_hypotheses_output).decode()}
         ])
         
-        db_service.upload_dataframe(
-            df=hypotheses_df, 
-            table_name="analysis_hypotheses", 
-            mode="append"
-        )
+        # The two tables are independent, so upload them at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            uploads = {
+                # Use 'overwrite' if you want to replace the table every run
+                executor.submit(db_service.upload_dataframe, llm_enriched_df, "llm_enriched_cat_content", "append"): "llm_enriched_cat_content",
+                executor.submit(db_service.upload_dataframe, hypotheses_df, "analysis_hypotheses", "append"): "analysis_hypotheses",
+            }
+            for future in as_completed(uploads):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"🔥 Critical: Databricks upload of {uploads[future]} failed. Data not persisted to warehouse. Error: {e}")
         
     except Exception as e:
         logger.error(f"🔥 Critical: Databricks upload failed. Data not persisted to warehouse. Error: {e}")
-        # The pipeline should likely continue to clean up even on failure
-        
-    # Final cleanup of local video files
-    s3_service.delete_local_downloads(download_base_dir)
 
     logger.info("\n" + "=" * 70)
     logger.info("✅ Pipeline execution for Scraped Cat Data analysis complete!")
@@ -0,0 +1,29 @@
+"""
+Instagram post ID (shortcode) extraction from post URLs.
+"""
+import re
+import pandas as pd
+
+# Shortcode segment of a post URL, e.g. https://www.instagram.com/reel/C8mtEPSp4b8/
+_POST_ID_RE = re.compile(r'/(?:reel|p|tv)/([^/?#]+)')
+
+def extract_post_id_from_url(url: str) -> str:
+    """
+    Extract post ID (shortcode) from Instagram URL.
+    URLs without a reel/p/tv segment fall back to their last path segment; None if there is none.
+    """
+    if not isinstance(url, str):
+        return None
+    m = _POST_ID_RE.search(url)
+    if m:
+        return m.group(1)
+    return url.rstrip('/').rsplit('/', 1)[-1] or None
+
+def extract_post_ids(urls: pd.Series) -> pd.Series:
+    """
+    Vectorized extract_post_id_from_url over a Series of Instagram URLs.
+    Uses pandas string kernels instead of calling the Python function per row.
+    """
+    last_segments = urls.str.rstrip('/').str.rsplit('/', n=1).str[-1]
+    post_ids = urls.str.extract(_POST_ID_RE, expand=False).fillna(last_segments).astype(object)
+    return post_ids.where(post_ids.notna() & (post_ids != ''), None)
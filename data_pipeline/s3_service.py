@@ -1,17 +1,50 @@
 """
 S3 Service for downloading and managing media files
 """
+import functools
 import os
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from config import AWS_CONFIG
 
+# Videos downloaded at the same time by download_batch
+S3_DOWNLOAD_CONCURRENCY = int(os.getenv("S3_DOWNLOAD_CONCURRENCY", "32"))
+
+# Connection pool large enough for concurrent downloads, with adaptive retries for throttling
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 10, "mode": "adaptive"},
+)
+
+MB = 1024 * 1024
+
+# Large videos are fetched as parallel byte ranges; small ones stay single-request
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * MB,
+    multipart_chunksize=16 * MB,
+    max_concurrency=16,
+    use_threads=True,
+)
+
+@functools.lru_cache(maxsize=1)
+def _make_s3_client():
+    """Build the S3 client once per process; boto3 clients are thread-safe."""
+    session = boto3.session.Session()
+    return session.client("s3", config=S3_CLIENT_CONFIG, **AWS_CONFIG)
+
+
 class S3Service:
     def __init__(self, bucket: str = "mediaretrievalv1", prefix: str = "instagram_media/"):
-        self.s3_client = boto3.client("s3", **AWS_CONFIG)
+        # Shared with every other S3Service so endpoints and TLS are only set up once
+        self.s3_client = _make_s3_client()
         self.bucket = bucket
         self.prefix = prefix
+        self._keys = None  # Video keys under the prefix, loaded by download_batch
+        self._transfer_config = S3_TRANSFER_CONFIG
         
     def download_file(self, s3_key: str, local_path: str) -> bool:
         """
@@ -28,7 +61,9 @@ class S3Service:
             # Create parent directory if it doesn't exist
             Path(local_path).parent.mkdir(parents=True, exist_ok=True)
             
-            self.s3_client.download_file(self.bucket, s3_key, local_path)
+            self.s3_client.download_file(
+                self.bucket, s3_key, local_path, Config=self._transfer_config
+            )
             print(f"✅ Downloaded: s3://{self.bucket}/{s3_key} -> {local_path}")
             return True
         except Exception as e:
@@ -55,7 +90,9 @@ class S3Service:
         local_path = os.path.join(local_dir, f"{post_id}.mp4")
         
         for s3_key in video_patterns:
-            if self.file_exists(s3_key):
+            # Use the key index from download_batch when present instead of a HeadObject per pattern
+            exists = s3_key in self._keys if self._keys is not None else self.file_exists(s3_key)
+            if exists:
                 if self.download_file(s3_key, local_path):
                     return local_path
         
@@ -70,6 +107,12 @@ class S3Service:
         except:
             return False
     
+    def _load_key_index(self):
+        """Lists every video key under the prefix once, one paginated request per 1000 keys."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}videos/")
+        self._keys = {obj['Key'] for page in pages for obj in page.get('Contents', [])}
+    
     def list_videos(self, prefix_filter: str = None) -> List[str]:
         """
         List all video files in S3 bucket.
@@ -96,9 +139,51 @@ class S3Service:
             print(f"❌ Error listing S3 objects: {e}")
             return []
     
+    def _refresh_key_index(self):
+        """Refresh the key index so each post is matched locally instead of probed with HeadObject."""
+        try:
+            self._load_key_index()
+        except Exception as e:
+            print(f"⚠️ Could not list S3 keys, probing each video instead: {e}")
+            self._keys = None
+    
+    def iter_download(self, post_ids: List[str], local_dir: str = "downloads") -> Iterator[Tuple[str, str]]:
+        """
+        Download videos by post IDs in the background and yield each one as soon as it lands,
+        so callers can process (and delete) a video while the next ones are still downloading.
+        At most S3_DOWNLOAD_CONCURRENCY downloads run ahead of the caller.
+        
+        Args:
+            post_ids: List of Instagram post shortcodes
+            local_dir: Local directory to save to
+            
+        Yields:
+            (post_id, local_path) for each successful download, in completion order
+        """
+        self._refresh_key_index()
+        
+        remaining = iter(post_ids)
+        with ThreadPoolExecutor(max_workers=S3_DOWNLOAD_CONCURRENCY) as executor:
+            pending = {}
+            while True:
+                # Keep the window full without queueing the whole batch onto local disk
+                for post_id in remaining:
+                    future = executor.submit(self.download_video_by_post_id, post_id, local_dir)
+                    pending[future] = post_id
+                    if len(pending) >= S3_DOWNLOAD_CONCURRENCY:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    post_id = pending.pop(future)
+                    local_path = future.result()
+                    if local_path:
+                        yield post_id, local_path
+    
     def download_batch(self, post_ids: List[str], local_dir: str = "downloads") -> Dict[str, str]:
         """
-        Download multiple videos by post IDs.
+        Download multiple videos by post IDs, several at a time.
         
         Args:
             post_ids: List of Instagram post shortcodes
@@ -107,13 +192,10 @@ class S3Service:
         Returns:
             Dictionary mapping post_id -> local_path (only successful downloads)
         """
-        results = {}
-        
-        for post_id in post_ids:
-            local_path = self.download_video_by_post_id(post_id, local_dir)
-            if local_path:
-                results[post_id] = local_path
+        downloaded = dict(self.iter_download(post_ids, local_dir))
         
+        # Keep the caller's post_id order regardless of completion order
+        results = {post_id: downloaded[post_id] for post_id in post_ids if post_id in downloaded}
         print(f"✅ Downloaded {len(results)}/{len(post_ids)} videos from S3")
         return results
     
@@ -125,5 +207,18 @@ class S3Service:
         """Clean up local download directory."""
         import shutil
         if os.path.exists(local_dir):
-            shutil.rmtree(local_dir)
-            print(f"🗑️ Cleaned up {local_dir}")
\ No newline at end of file
+            # Unlink the videos in parallel, then remove the (now empty) directory tree
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                list(executor.map(os.unlink, _iter_files(local_dir)))
+            shutil.rmtree(local_dir, ignore_errors=True)
+            print(f"🗑️ Cleaned up {local_dir}")
+
+
+def _iter_files(directory: str) -> Iterator[str]:
+    """Yield every file path under directory using os.scandir."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            else:
+                yield entry.path
@@ -2,12 +2,14 @@
 Apify API client for data scraping.
 """
 import json
+import orjson
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 import logging
 import pandas as pd
+import pyarrow as pa
 
 from config import ScrapingConfig, BASE_DATA_DIR
 
@@ -39,8 +41,15 @@ class ScrapingResult:
             return pd.DataFrame()
         
         try:
-            df = pd.json_normalize(self.data)
-            logger.info(f"✅ Converted {len(self.data)} items to DataFrame with {df.shape[1]} columns.")
+            # json_normalize only changes the result when some item has a nested dict
+            # (lists stay as cell values), so flat payloads take the cheaper from_records path
+            is_nested = any(isinstance(value, dict) for item in self.data for value in item.values())
+            if is_nested:
+                df = pd.json_normalize(self.data)
+            else:
+                df = pd.DataFrame.from_records(self.data)
+            method = "json_normalize" if is_nested else "from_records"
+            logger.info(f"✅ Converted {len(self.data)} items to DataFrame with {df.shape[1]} columns ({method}).")
             return df
         except Exception as e:
             logger.error(f"❌ Failed to convert data to DataFrame: {str(e)}")
@@ -65,14 +74,15 @@ class ScrapingResult:
         # Generate filenames
         json_file = data_dir / f"{filename}.json"
         csv_file = data_dir / f"{filename}.csv"
+        parquet_file = data_dir / f"{filename}.parquet"
         metadata_file = data_dir / f"{filename}_metadata.json"
         
         saved_files = {}
         
         try:
-            # Save raw JSON data
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            # Save raw JSON data; orjson writes compact UTF-8 from C instead of pretty-printing in Python
+            with open(json_file, 'wb') as f:
+                f.write(orjson.dumps(self.data, default=str, option=orjson.OPT_NON_STR_KEYS))
             saved_files['json'] = json_file
             logger.info(f"💾 Saved JSON data: {json_file}")
             
@@ -82,6 +92,15 @@ class ScrapingResult:
                 df.to_csv(csv_file, index=False, encoding='utf-8')
                 saved_files['csv'] = csv_file
                 logger.info(f"💾 Saved CSV data: {csv_file}")
+                
+                # Typed, compressed copy for downstream pandas/Databricks reads
+                try:
+                    df.to_parquet(parquet_file, engine='pyarrow', compression='zstd', index=False)
+                    saved_files['parquet'] = parquet_file
+                    logger.info(f"💾 Saved Parquet data: {parquet_file}")
+                except (pa.ArrowException, ValueError) as e:
+                    # Columns mixing nested and scalar values have no single Arrow type
+                    logger.warning(f"⚠️ Skipped Parquet output: {str(e)}")
             
             # Save metadata
             metadata = {
@@ -4,7 +4,8 @@ Tests: Labeling → S3 → Download → Gemini (mock) → Hypothesis → Databri
 """
 import sys
 import logging
-import json
+import mmap
+import orjson
 import pandas as pd
 import os
 from datetime import datetime
@@ -13,6 +14,7 @@ from s3_service import S3Service
 from hypothesis_engine import HypothesisEngine
 from databricks_service import DatabricksService
 from config import DATABRICKS_CONFIG
+from post_ids import extract_post_ids
 
 # Setup logging
 logging.basicConfig(
@@ -31,8 +33,9 @@ def main():
     # ==================== STEP 1: LOAD EXISTING LABELED DATA ====================
     logger.info("\n📥 STEP 1: Loading existing labeled data...")
     
-    with open("../datasets/instagram/labeled_scraped_data.json", "r", encoding="utf-8") as f:
-        labeled_data = json.load(f)
+    with open("../datasets/instagram/labeled_scraped_data.json", "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            labeled_data = orjson.loads(view)
     
     # Take only first 5 posts for testing
     labeled_data_sample = labeled_data[:5]
@@ -45,22 +48,13 @@ def main():
     # ==================== STEP 2: EXTRACT POST IDs ====================
     logger.info("\n🔍 STEP 2: Extracting post IDs...")
     
-    def extract_post_id(url):
-        try:
-            parts = url.rstrip('/').split('/')
-            if 'p' in parts:
-                p_index = parts.index('p')
-                return parts[p_index + 1]
-            return parts[-1] if parts[-1] else parts[-2]
-        except:
-            return None
-    
-    labeled_df['post_id'] = labeled_df['Post URL'].apply(extract_post_id)
+    labeled_df['post_id'] = extract_post_ids(labeled_df['Post URL'])
     labeled_df = labeled_df.dropna(subset=['post_id'])
     
     logger.info(f"✅ Extracted {len(labeled_df)} post IDs")
-    for idx, row in labeled_df.iterrows():
-        logger.info(f"   - {row['post_id']}: {row.get('Views', 0):,} views")
+    views = labeled_df['Views'] if 'Views' in labeled_df.columns else pd.Series(0, index=labeled_df.index)
+    for post_id, post_views in zip(labeled_df['post_id'], views):
+        logger.info(f"   - {post_id}: {post_views:,} views")
     
     # ==================== STEP 3: CHECK S3 (OPTIONAL - Skip if no videos) ====================
     logger.info("\n☁️ STEP 3: Checking S3 videos...")
@@ -113,8 +107,8 @@ def main():
     }
     
     output_file = f"minimal_pipeline_output_{timestamp}.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(output_package, f, indent=2, ensure_ascii=False)
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(output_package, option=orjson.OPT_INDENT_2))
     
     logger.info(f"✅ Saved results to: {output_file}")
     
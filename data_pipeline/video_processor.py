@@ -1,8 +1,16 @@
 import os
+import threading
+import time
 import boto3
+import numpy as np
 import pandas as pd
 import requests
 import instaloader
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from config import AWS_CONFIG, INSTAGRAM_USERNAME
 
 # -------------- USER CONFIG --------------
@@ -12,11 +20,54 @@ s3_bucket = "mediaretrievalv1"
 s3_prefix = "instagram_media/"
 # -----------------------------------------
 
-# Init S3 client
-s3_client = boto3.client("s3", **AWS_CONFIG)
+# Posts processed at the same time; their Instagram lookups still run one at a time
+MAX_WORKERS = 8
 
-def upload_to_s3(content, key):
-    s3_client.put_object(Body=content, Bucket=s3_bucket, Key=key)
+# Transient Instagram failures (429/5xx, dropped connections) are retried with exponential backoff
+INSTAGRAM_FETCH_ATTEMPTS = 5
+INSTAGRAM_BACKOFF_BASE_SECONDS = 1
+INSTAGRAM_BACKOFF_MAX_SECONDS = 30
+
+# Circuit breaker: this many posts in a row that still fail after their retries mean Instagram is
+# throttling or blocking the account, so lookups pause for the cooldown instead of hammering it
+INSTAGRAM_BREAKER_THRESHOLD = 5
+INSTAGRAM_BREAKER_COOLDOWN_SECONDS = 300
+
+MB = 1024 * 1024
+
+# Reels above 8MB are uploaded as parallel multipart chunks
+TRANSFER_CFG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=8 * MB,
+    max_concurrency=10,
+    use_threads=True,
+)
+
+# Init S3 client (shared by all worker threads)
+s3_client = boto3.client(
+    "s3",
+    config=Config(max_pool_connections=max(16, TRANSFER_CFG.max_request_concurrency * 2)),
+    **AWS_CONFIG
+)
+
+# One pooled HTTP session for all media downloads, so CDN connections are kept alive across posts
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+# The shared Instaloader context (session, RateController) isn't thread-safe, so only one thread
+# uses it at a time; CDN downloads and S3 uploads still run in parallel
+_instagram_lock = threading.Lock()
+
+# Breaker state, only touched while holding _instagram_lock
+_consecutive_fetch_failures = 0
+_breaker_open_until = 0.0
+
+def upload_to_s3(fileobj, key):
+    s3_client.upload_fileobj(fileobj, s3_bucket, key, Config=TRANSFER_CFG)
     print(f"✅ Uploaded: s3://{s3_bucket}/{key}")
 
 def get_instaloader():
@@ -36,23 +87,27 @@ def get_instaloader():
     except FileNotFoundError:
         L.interactive_login(INSTAGRAM_USERNAME)
         L.save_session_to_file()
+
+    # Keep the logged-in session but give it a pool sized for the worker threads and retry 5xx at
+    # the HTTP layer. 429s are left to Instaloader, whose rate controller backs off on them
+    L.context._session.mount("https://", HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=1.0,
+            status_forcelist=[500, 502, 503, 504],
+            respect_retry_after_header=True,
+        ),
+    ))
     
     return L
 
 # ---------------- Post Processing ----------------
-def process_post(url, L=None):
-    if L is None:
-        L = get_instaloader()
-    
-    shortcode = url.strip("/").split("/")[-1]
-    
-    try:
-        post = instaloader.Post.from_shortcode(L.context, shortcode)
-    except Exception as e:
-        print(f"❌ Failed to fetch post {url}: {e}")
-        return
-
+def _media_items(post, shortcode):
+    """(media_url, s3_key) for every image/video in the post."""
     if post.typename == "GraphSidecar":
+        items = []
         for idx, node in enumerate(post.get_sidecar_nodes(), start=1):
             if node.is_video:
                 media_url = node.video_url
@@ -62,54 +117,106 @@ def process_post(url, L=None):
                 ext, folder = ".jpg", "images/"
 
             filename = f"{shortcode}_{idx}{ext}"
-            s3_key = os.path.join(s3_prefix, folder, filename)
-            _download_and_upload(media_url, s3_key)
+            items.append((media_url, os.path.join(s3_prefix, folder, filename)))
+        return items
+
+    if post.is_video:
+        media_url = post.video_url
+        ext, folder = ".mp4", "videos/"
     else:
-        if post.is_video:
-            media_url = post.video_url
-            ext, folder = ".mp4", "videos/"
-        else:
-            media_url = post.url
-            ext, folder = ".jpg", "images/"
-
-        filename = f"{shortcode}{ext}"
-        s3_key = os.path.join(s3_prefix, folder, filename)
-        _download_and_upload(media_url, s3_key)
-
-def _download_and_upload(media_url, s3_key):
+        media_url = post.url
+        ext, folder = ".jpg", "images/"
+
+    filename = f"{shortcode}{ext}"
+    return [(media_url, os.path.join(s3_prefix, folder, filename))]
+
+def _fetch_post_media(L, shortcode):
+    """Resolve a post's media, retrying connection errors with exponential backoff."""
+    for attempt in range(INSTAGRAM_FETCH_ATTEMPTS):
+        try:
+            post = instaloader.Post.from_shortcode(L.context, shortcode)
+            return _media_items(post, shortcode)
+        except (requests.exceptions.ConnectionError, instaloader.exceptions.ConnectionException) as e:
+            if attempt == INSTAGRAM_FETCH_ATTEMPTS - 1:
+                raise
+            delay = min(INSTAGRAM_BACKOFF_BASE_SECONDS * 2 ** attempt, INSTAGRAM_BACKOFF_MAX_SECONDS)
+            print(f"⚠️ Fetch of {shortcode} failed ({e}), retrying in {delay}s")
+            time.sleep(delay)
+
+def _record_fetch_result(succeeded):
+    """Update the circuit breaker after a post lookup; caller holds _instagram_lock."""
+    global _consecutive_fetch_failures, _breaker_open_until
+    if succeeded:
+        _consecutive_fetch_failures = 0
+        return
+    _consecutive_fetch_failures += 1
+    if _consecutive_fetch_failures >= INSTAGRAM_BREAKER_THRESHOLD:
+        _breaker_open_until = time.monotonic() + INSTAGRAM_BREAKER_COOLDOWN_SECONDS
+        _consecutive_fetch_failures = 0
+        print(f"🛑 {INSTAGRAM_BREAKER_THRESHOLD} Instagram lookups failed in a row, "
+              f"pausing lookups for {INSTAGRAM_BREAKER_COOLDOWN_SECONDS}s")
+
+def process_post(url, L=None, session=None):
+    if L is None:
+        L = get_instaloader()
+    
+    shortcode = url.strip("/").split("/")[-1]
+    
+    # Media URLs can trigger further GraphQL requests, so resolve them while holding the lock
+    with _instagram_lock:
+        if time.monotonic() < _breaker_open_until:
+            print(f"⏭️ Skipping {url}: Instagram lookups are paused by the circuit breaker")
+            return
+        try:
+            media = _fetch_post_media(L, shortcode)
+        except (requests.exceptions.ConnectionError, instaloader.exceptions.ConnectionException) as e:
+            # Retries are exhausted, so this counts towards tripping the breaker
+            _record_fetch_result(False)
+            print(f"❌ Failed to fetch post {url}: {e}")
+            return
+        except Exception as e:
+            # Post-specific failures (deleted or private posts) say nothing about throttling
+            print(f"❌ Failed to fetch post {url}: {e}")
+            return
+        _record_fetch_result(True)
+
+    for media_url, s3_key in media:
+        _download_and_upload(media_url, s3_key, session)
+
+def _download_and_upload(media_url, s3_key, session=None):
     try:
-        resp = requests.get(media_url)
-        if resp.status_code == 200:
-            upload_to_s3(resp.content, s3_key)
-        else:
-            print(f"❌ Failed to fetch {media_url}, status {resp.status_code}")
+        with (session or _SESSION).get(media_url, stream=True, timeout=(5, 30)) as resp:
+            if resp.status_code != 200:
+                print(f"❌ Failed to fetch {media_url}, status {resp.status_code}")
+                return
+            # Upload straight from the socket: multipart parts go out while the rest is still downloading
+            resp.raw.decode_content = True
+            upload_to_s3(resp.raw, s3_key)
     except Exception as e:
         print(f"❌ Error downloading {media_url}: {e}")
 
 def process_dataframe(df: pd.DataFrame, post_url_column: str) -> None:
-    for i, row in df.iterrows():
-        url = row[post_url_column]
-        if pd.isna(url):
-            continue
+    # One Instaloader login, shared by every worker along with the module HTTP session
+    L = get_instaloader()
+
+    def process_row(i, url):
         print(f"Processing row {i+1}: {url}")
         try:
-            process_post(url)
+            process_post(url, L)
         except Exception as e:
             print(f"❌ Error with {url}: {e}")
 
+    # Only the URL column is needed, so pull it out once instead of boxing every row with iterrows
+    urls = df[post_url_column].to_numpy(dtype=object)
+    rows = np.flatnonzero(pd.notna(urls))
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(process_row, rows, urls[rows]))
+
 
 # ---------------- Main Script ----------------
 def main():
     df = pd.read_excel(excel_file)
-    for i, row in df.iterrows():
-        url = row[post_url_column]
-        if pd.isna(url):
-            continue
-        print(f"Processing row {i+1}: {url}")
-        try:
-            process_post(url)
-        except Exception as e:
-            print(f"❌ Error with {url}: {e}")
+    process_dataframe(df, post_url_column)
 
 if __name__ == "__main__":
     main()
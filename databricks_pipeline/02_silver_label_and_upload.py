@@ -1,10 +1,15 @@
 # Databricks notebook source
 import logging
+import pandas as pd
 from label_data_as_viral import compute_engagement
-from video_processor import VideoProcessor
+from video_processor import get_shared_video_processor
 from pyspark.sql import SparkSession
 
 spark = SparkSession.builder.getOrCreate()
+# Arrow-backed toPandas()/createDataFrame, falling back to the row path for unsupported types
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+spark.conf.set("spark.sql.execution.arrow.pyspark.fallback.enabled", "true")
+spark.conf.set("spark.sql.execution.arrow.maxRecordsPerBatch", "50000")
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -27,35 +32,17 @@ dataset_id = dbutils.jobs.taskValues.get(
 
 logger.info(f"Processing dataset_id={dataset_id}")
 
-# Load bronze data
-bronze_df = spark.table("workspace.test.nus_bronze_instagram_ingested")
+# Load bronze data. Each ingest appends its own files holding a single dataset_id, so Delta's
+# per-file min/max stats let this filter skip every other dataset's files without partitioning
+bronze_df = spark.table(bronze_path)
 bronze_df = bronze_df.filter(bronze_df.dataset_id == dataset_id)
 display(bronze_df)
 
 # COMMAND ----------
 
-# Convert to Pandas for business logic
-pdf = bronze_df.toPandas()
-logger.info(f"🏷️ Running viral labeling process for dataset_id {dataset_id}...")
-labelled_df = compute_engagement(pdf)
-logger.info(f"✅ Labeling complete.")
-logger.info(f"✅ Labeled data with {len(labelled_df)} records.")
-labelled_df
-
-# COMMAND ----------
-
-# Upload videos
-vp = VideoProcessor()
-logger.info(f"📹 Extracting videos for dataset_id {dataset_id}...")
-transformed_df = vp.upload_video_df(labelled_df)
-transformed_df
-
-# COMMAND ----------
-
 from pyspark.sql.types import (
     StructType, StructField, StringType, DoubleType, DateType, LongType, BooleanType, TimestampType
 )
-from pyspark.sql.functions import col
 
 # Target delta table schema
 TARGET_SCHEMA = StructType([
@@ -79,23 +66,67 @@ TARGET_SCHEMA = StructType([
     StructField("s3_upload_flag", BooleanType())
 ])
 
-def enforce_schema(df, schema):
-    """Casts and selects columns in the DataFrame to match the target schema."""
-    select_cols = [
-        col(field.name).cast(field.dataType).alias(field.name)
-        for field in schema.fields
-    ]
-    return df.select(*select_cols)
+def to_target_pandas(pdf, schema):
+    """Casts and selects columns in the pandas DataFrame to match the target schema."""
+    out = pd.DataFrame(index=pdf.index)
+    for field in schema.fields:
+        values = pdf[field.name] if field.name in pdf.columns else pd.Series(None, index=pdf.index)
+        if isinstance(field.dataType, DoubleType):
+            out[field.name] = pd.to_numeric(values, errors="coerce").astype("float64")
+        elif isinstance(field.dataType, LongType):
+            out[field.name] = pd.to_numeric(values, errors="coerce").astype("Int64")
+        elif isinstance(field.dataType, BooleanType):
+            out[field.name] = values.astype("boolean")
+        elif isinstance(field.dataType, TimestampType):
+            out[field.name] = pd.to_datetime(values, errors="coerce")
+        elif isinstance(field.dataType, DateType):
+            out[field.name] = pd.to_datetime(values, errors="coerce").dt.date
+        else:
+            # The nullable string dtype converts to Arrow directly, without a per-value str() pass
+            out[field.name] = values.astype("string")
+    return out
 
 # COMMAND ----------
 
-# Convert to Spark DataFrame and save to Delta
-spark_df = spark.createDataFrame(transformed_df)
+# Partitions for labeling/upload. Without a count, repartition uses spark.sql.shuffle.partitions
+# (200 by default), and every concurrently running partition talks to Instagram on the same account
+SILVER_PARTITIONS = 16
+
+def run_silver_partition(batches):
+    """
+    Label and upload the videos of one partition on an executor. The bronze data is
+    partitioned by username, so each account's posts (needed for its rolling average)
+    are all in the same partition.
+    """
+    # repartition leaves some shuffle partitions without rows, and pd.concat rejects an empty list
+    batches = list(batches)
+    if not batches:
+        return
+    pdf = pd.concat(batches, ignore_index=True)
+    if pdf.empty:
+        return
+    labelled_df = compute_engagement(pdf)
+    # Reuses the worker's VideoProcessor (S3 client, HTTP session, logged-in Instaloader)
+    transformed_df = get_shared_video_processor().upload_video_df(labelled_df)
+    yield to_target_pandas(transformed_df, TARGET_SCHEMA)
+
+# Labeling and video uploads run in parallel across executors instead of on the driver. The
+# results reach the Delta writer as Arrow batches from the executors, never as a driver-side
+# pandas DataFrame, so there is no createDataFrame conversion to speed up
+logger.info(f"🏷️ Running viral labeling and video upload for dataset_id {dataset_id}...")
+silver_df = (
+    bronze_df
+    .repartition(SILVER_PARTITIONS, "username")
+    .mapInPandas(run_silver_partition, schema=TARGET_SCHEMA)
+)
+
+# COMMAND ----------
 
-# Enforce schema and write to target Delta table
+# Write to target Delta table (this triggers the labeling/upload job above)
 silver_path = "workspace.test.nus_silver_instagram_transformed"
-silver_df = enforce_schema(spark_df, TARGET_SCHEMA)
-spark_df.write.format("delta").mode("append").saveAsTable(silver_path)
+# silver_df already matches TARGET_SCHEMA, so the write never needs to evolve the table schema
+spark.conf.set("spark.databricks.delta.schema.autoMerge.enabled", "false")
+silver_df.write.format("delta").mode("append").option("mergeSchema", "false").saveAsTable(silver_path)
 
 # Pass dataset_id down to the last task for reference
 dbutils.jobs.taskValues.set(key="silver_path", value=silver_path)
@@ -1,6 +1,6 @@
 # Databricks notebook source
 import logging
-from gemini_service import analyze_video
+from gemini_service import analyze_video_cached
 from pyspark.sql import SparkSession
 
 spark = SparkSession.builder.getOrCreate()
@@ -31,18 +31,89 @@ silver_df = silver_df.filter(silver_df.dataset_id == dataset_id)
 # COMMAND ----------
 
 # Run Gemini analysis
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+from pyspark.sql.types import StructType, StructField, StringType, LongType
+from config import S3_BUCKET_PATH, get_s3_client
+
+# Gold table schema
+GOLD_SCHEMA = StructType([
+    StructField("dataset_id", StringType(), False),
+    StructField("post_id", StringType()),
+    StructField("viral", LongType()),
+    StructField("video_analysis", StringType()),
+    StructField("performance_context", StringType()),
+    StructField("virality_analysis", StringType())
+])
+GOLD_ARROW_SCHEMA = pa.schema([
+    pa.field("dataset_id", pa.string(), nullable=False),
+    pa.field("post_id", pa.string()),
+    pa.field("viral", pa.int64()),
+    pa.field("video_analysis", pa.string()),
+    pa.field("performance_context", pa.string()),
+    pa.field("virality_analysis", pa.string())
+])
+
+# Silver columns used by gemini_batch and analyze_video's performance prompt
+GEMINI_INPUT_COLUMNS = [
+    "dataset_id", "post_id", "viral", "views", "likes", "comments", "duration", "caption", "date"
+]
+
+# Gemini calls are network-bound: partitions spread them over executors, threads overlap them within one
+GEMINI_PARTITIONS = 4
+GEMINI_THREADS_PER_PARTITION = 8
+
+def gemini_batch(batches):
+    """Analyze the videos of one partition, yielding a single Arrow batch of gold rows."""
+    s3 = get_s3_client()
+
+    def analyze_row(row):
+        post_id = row["post_id"]
+        try:
+            # Videos are stored in S3 under their post_id (see VideoProcessor)
+            with tempfile.TemporaryDirectory() as temp_dir:
+                video_path = os.path.join(temp_dir, f"{post_id}.mp4")
+                s3.download_file(S3_BUCKET_PATH, post_id, video_path)
+                result = analyze_video_cached(video_path, row, post_id)
+        except Exception as e:
+            logger.error(f"Failed Gemini analysis for {post_id}: {e}")
+            result = {"video_analysis": f"Error: {e}", "performance_context": None, "virality_analysis": None}
+        return {
+            "dataset_id": row["dataset_id"],
+            "post_id": post_id,
+            "viral": row.get("viral"),
+            "video_analysis": result.get("video_analysis"),
+            "performance_context": result.get("performance_context"),
+            "virality_analysis": result.get("virality_analysis")
+        }
+
+    rows = [row for batch in batches for row in batch.to_pylist()]
+    if not rows:
+        return
+    with ThreadPoolExecutor(max_workers=GEMINI_THREADS_PER_PARTITION) as executor:
+        results = list(executor.map(analyze_row, rows))
+    yield pa.RecordBatch.from_pylist(results, schema=GOLD_ARROW_SCHEMA)
+
 logger.info(f"Running Gemini analysis for dataset_id={dataset_id}")
-pdf = silver_df.toPandas()
 # TODO: Implement the sampling of full dataset (XM)
-sample_df = pdf.head(20)
-analysis_df = analyze_video(sample_df)  # add columns like sentiment, topic, etc.
-analysis_df
+# Sample in Spark so only 20 rows are shuffled to the UDF
+analysis_df = (
+    silver_df
+    .filter(silver_df.s3_upload_flag)
+    # Only the fields gemini_batch and the analysis prompt read are shipped to the UDF
+    .select(*GEMINI_INPUT_COLUMNS)
+    .limit(20)
+    .repartition(GEMINI_PARTITIONS)
+    .mapInArrow(gemini_batch, schema=GOLD_SCHEMA)
+)
 
 # COMMAND ----------
 
-# Save final table
+# Save final table (this triggers the Gemini analysis above)
 gold_path = "workspace.test.nus_viral_video_analysis_temp"
-spark_df = spark.createDataFrame(analysis_df)
-spark_df.write.format("delta").mode("append").saveAsTable(gold_path)
+analysis_df.write.format("delta").mode("append").saveAsTable(gold_path)
 
-logger.info(f"Gold table written to {gold_path} for dataset_id={dataset_id}")
\ No newline at end of file
+logger.info(f"Gold table written to {gold_path} for dataset_id={dataset_id}")
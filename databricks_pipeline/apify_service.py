@@ -11,13 +11,18 @@ import os
 import time
 import logging
 import pandas as pd
+import pyarrow as pa
 from datetime import datetime
+from typing import Iterator, List
 from apify_client import ApifyClient
 from config import ApifyConfig
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Dataset items converted to Arrow at a time when streaming a dataset
+ITEM_BATCH_SIZE = 10_000
+
 class ApifyService:
     """
     Service class for obtaining data through Apify API
@@ -62,6 +67,26 @@ class ApifyService:
         # Fetch dataset via returned dataset_id
         return self.get_dataset_id_df(dataset_id=dataset_id)
 
+    @staticmethod
+    def _records_to_table(items: List[dict]) -> pa.Table:
+        """
+        Convert items to Arrow with one column per key seen in any item (None where missing).
+        pa.Table.from_pylist takes its columns from the first item only and silently drops the rest.
+        """
+        keys = list(dict.fromkeys(key for item in items for key in item))
+        return pa.Table.from_pydict({key: [item.get(key) for item in items] for key in keys})
+
+    def _iter_record_batches(self, dataset_id: str, batch_size: int = ITEM_BATCH_SIZE) -> Iterator[pa.Table]:
+        """Stream dataset items from Apify, converting every batch_size items to Arrow."""
+        buffer = []
+        for item in self.apify_client.dataset(dataset_id).iterate_items():
+            buffer.append(item)
+            if len(buffer) == batch_size:
+                yield self._records_to_table(buffer)
+                buffer = []
+        if buffer:
+            yield self._records_to_table(buffer)
+
     def get_dataset_id_df(self, dataset_id: str) -> pd.DataFrame:
         """Retrieves a DataFrame from a previous scrape run's dataset_id
 
@@ -70,6 +95,48 @@ class ApifyService:
         Returns: pandas DataFrame object for the dataset_id
         """
         logger.info(f"Attempting to fetch dataset_id: {dataset_id}")
+        # Epoch and timestamp come from the same instant; the timestamp stays a native (second
+        # precision) timestamp rather than a formatted string, so Arrow/Spark carry it as-is
+        ingested_at = datetime.now()
+        ingestion_columns = {
+            "dataset_id": dataset_id,
+            "ingested_epoch": ingested_at.timestamp(),
+            "ingested_timestamp": ingested_at.replace(microsecond=0),
+        }
+        try:
+            # Items are streamed and converted to Arrow in batches, so the raw JSON for the whole
+            # dataset is never held at once. Nested objects stay single struct columns instead of
+            # being flattened by json_normalize (only top-level fields are used downstream)
+            batches = list(self._iter_record_batches(dataset_id))
+            # Later batches may see fields or types the first one didn't; promote to a common schema
+            table = pa.concat_tables(batches, promote_options="permissive") if batches else None
+        except (pa.ArrowException, ValueError) as e:
+            logger.warning(f"⚠️ Arrow conversion failed ({e}), falling back to json_normalize.")
+            return self._get_dataset_id_df_normalized(dataset_id, ingestion_columns)
+        except Exception as e:
+            logger.error(f"❌ Failed to fetch dataset items: {str(e)}")
+            raise
+
+        if table is None or table.num_rows == 0:
+            logger.warning("⚠️ No data to convert to DataFrame.")
+            return pd.DataFrame()
+        logger.info(f"✅ Fetched {table.num_rows} items from dataset_id {dataset_id}")
+
+        try:
+            for name, value in ingestion_columns.items():
+                value = pa.scalar(value, pa.timestamp("s")) if isinstance(value, datetime) else pa.scalar(value)
+                table = table.append_column(name, pa.repeat(value, table.num_rows))
+            num_rows = table.num_rows
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table
+            logger.info(f"✅ Converted {num_rows} items to DataFrame with {df.shape[1]} columns.")
+            return df
+        except Exception as e:
+            logger.error(f"❌ Failed to convert data to DataFrame: {str(e)}")
+            raise
+
+    def _get_dataset_id_df_normalized(self, dataset_id: str, ingestion_columns: dict) -> pd.DataFrame:
+        """Fallback for items Arrow can't type consistently: fetch them all and json_normalize."""
         try:
             dataset_items = self.apify_client.dataset(dataset_id).list_items()
             logger.info(f"✅ Fetched {dataset_items.count} items from dataset_id {dataset_id}")
@@ -81,14 +148,13 @@ class ApifyService:
         if not data:
             logger.warning("⚠️ No data to convert to DataFrame.")
             return pd.DataFrame()
-        
+
         try:
             df = pd.json_normalize(data)
+            for name, value in ingestion_columns.items():
+                df[name] = value
             logger.info(f"✅ Converted {len(data)} items to DataFrame with {df.shape[1]} columns.")
-            df["dataset_id"] = dataset_id
-            df["ingested_epoch"] = time.time()
-            df["ingested_timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             return df
         except Exception as e:
             logger.error(f"❌ Failed to convert data to DataFrame: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -3,18 +3,17 @@ Script to extract first frame thumbnails from S3 videos and upload them back to
 
 This script:
 1. Lists all .mp4 videos in specified S3 folders
-2. Downloads each video temporarily
-3. Extracts the first frame as a PNG thumbnail using ffmpeg
-4. Uploads the thumbnail back to the same S3 folder
-5. Cleans up temporary files
+2. Extracts the first frame as a PNG thumbnail using ffmpeg, reading the video from S3
+3. Uploads the thumbnail back to the same S3 folder
 """
 
 import boto3
 import subprocess
 import os
-import tempfile
 import logging
-from typing import List, Tuple
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -32,6 +31,14 @@ BUCKET_NAME = 'gtm-engine-media-dev'
 BASE_PREFIX = 'nus/dataset_91qIDxbbk340bcKdW'
 FOLDERS = ['viral', 'non_viral']
 
+# Videos processed at the same time; each one is mostly waiting on S3
+MAX_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '16'))
+
+MB = 1024 * 1024
+
+# Leading bytes of a video fetched to try decoding the first frame without the rest of the file
+THUMBNAIL_PROBE_BYTES = 2 * MB
+
 
 class ThumbnailGenerator:
     """Handles thumbnail generation from S3 videos."""
@@ -43,7 +50,11 @@ class ThumbnailGenerator:
         # Initialize S3 client with credentials from environment
         # If AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY are set in .env,
         # boto3 will automatically use them
-        self.s3_client = boto3.client('s3')
+        # The client is shared by all worker threads, so its connection pool must cover them
+        self.s3_client = boto3.client(
+            's3',
+            config=Config(max_pool_connections=max(32, MAX_WORKERS * 2))
+        )
 
     def list_videos(self, prefix: str) -> List[str]:
         """
@@ -55,6 +66,20 @@ class ThumbnailGenerator:
         Returns:
             List of S3 keys for .mp4 files
         """
+        video_keys, _ = self.list_videos_and_thumbnails(prefix)
+        return video_keys
+
+    def list_videos_and_thumbnails(self, prefix: str) -> Tuple[List[str], Set[str]]:
+        """
+        List all .mp4 files and existing .png thumbnails in the specified S3 prefix,
+        in a single pagination pass.
+
+        Args:
+            prefix: S3 prefix/folder path
+
+        Returns:
+            Tuple of (S3 keys for .mp4 files, set of S3 keys for .png files)
+        """
         logger.info(f"Listing videos in s3://{self.bucket_name}/{prefix}")
 
         try:
@@ -62,6 +87,7 @@ class ThumbnailGenerator:
             pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
 
             video_keys = []
+            thumbnail_keys = set()
             for page in pages:
                 if 'Contents' not in page:
                     continue
@@ -70,92 +96,97 @@ class ThumbnailGenerator:
                     key = obj['Key']
                     if key.lower().endswith('.mp4'):
                         video_keys.append(key)
+                    elif key.lower().endswith('.png'):
+                        thumbnail_keys.add(key)
 
-            logger.info(f"Found {len(video_keys)} videos")
-            return video_keys
+            logger.info(f"Found {len(video_keys)} videos, {len(thumbnail_keys)} thumbnails")
+            return video_keys, thumbnail_keys
 
         except Exception as e:
             logger.error(f"Error listing videos: {e}")
             raise
 
-    def download_video(self, s3_key: str, local_path: str) -> None:
+    def extract_thumbnail_from_prefix(self, s3_key: str) -> Optional[bytes]:
         """
-        Download video from S3 to local path.
+        Extract the first frame from only the first THUMBNAIL_PROBE_BYTES of an S3 video.
+
+        Fast-start MP4s keep their index at the front, so the first frame is decodable
+        from a short range GET piped into ffmpeg.
 
         Args:
-            s3_key: S3 object key
-            local_path: Local file path to save to
-        """
-        logger.info(f"Downloading {s3_key}")
-        try:
-            self.s3_client.download_file(self.bucket_name, s3_key, local_path)
-        except Exception as e:
-            logger.error(f"Error downloading {s3_key}: {e}")
-            raise
+            s3_key: S3 object key of the video
 
-    def extract_thumbnail(self, video_path: str, thumbnail_path: str) -> None:
+        Returns:
+            PNG-encoded first frame, or None if the prefix wasn't enough to decode it
         """
-        Extract first frame from video as PNG thumbnail using ffmpeg.
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            Range=f'bytes=0-{THUMBNAIL_PROBE_BYTES - 1}'
+        )
+        prefix = response['Body'].read()
+
+        cmd = [
+            'ffmpeg',
+            '-err_detect', 'ignore_err',
+            '-fflags', '+discardcorrupt',
+            '-i', 'pipe:0',
+            '-frames:v', '1',
+            '-f', 'image2',
+            '-vcodec', 'png',
+            'pipe:1'
+        ]
+        result = subprocess.run(cmd, input=prefix, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        if result.returncode != 0 or not result.stdout:
+            logger.info(f"First {len(prefix)} bytes of {s3_key} not enough for a thumbnail, reading full video")
+            return None
+        return result.stdout
+
+    def extract_thumbnail_from_s3(self, s3_key: str) -> bytes:
+        """
+        Extract the first frame of an S3 video as PNG bytes, without downloading the file.
+
+        ffmpeg is given a presigned URL rather than a stdin pipe: MP4s whose index (moov atom)
+        sits at the end of the file can't be decoded from a pipe, while over HTTP ffmpeg seeks
+        with range requests and only fetches the bytes it needs for the first frame.
 
         Args:
-            video_path: Path to input video file
-            thumbnail_path: Path to output thumbnail file
+            s3_key: S3 object key of the video
+
+        Returns:
+            PNG-encoded first frame
         """
-        logger.info(f"Extracting thumbnail from {video_path}")
+        logger.info(f"Extracting thumbnail from s3://{self.bucket_name}/{s3_key}")
+
+        video_url = self.s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': s3_key},
+            ExpiresIn=600
+        )
+        cmd = [
+            'ffmpeg',
+            '-i', video_url,
+            '-frames:v', '1',
+            '-f', 'image2',
+            '-vcodec', 'png',
+            'pipe:1'
+        ]
 
         try:
-            # ffmpeg command to extract first frame
-            # -i: input file
-            # -vframes 1: extract only 1 frame
-            # -vf scale=-1:720: scale to 720p height, maintain aspect ratio
-            # -q:v 2: high quality (scale 2-31, lower is better)
-            cmd = [
-                'ffmpeg',
-                '-i', video_path,
-                '-vframes', '1',
-                '-q:v', '2',
-                '-y',  # Overwrite output file if exists
-                thumbnail_path
-            ]
-
-            subprocess.run(
+            result = subprocess.run(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 check=True
             )
-
-            logger.info(f"Thumbnail created: {thumbnail_path}")
-
         except subprocess.CalledProcessError as e:
             logger.error(f"ffmpeg error: {e.stderr.decode()}")
             raise
-        except Exception as e:
-            logger.error(f"Error extracting thumbnail: {e}")
-            raise
-
-    def upload_thumbnail(self, local_path: str, s3_key: str) -> None:
-        """
-        Upload thumbnail to S3.
-
-        Args:
-            local_path: Local file path
-            s3_key: S3 object key to upload to
-        """
-        logger.info(f"Uploading thumbnail to {s3_key}")
-
-        try:
-            self.s3_client.upload_file(
-                local_path,
-                self.bucket_name,
-                s3_key,
-                ExtraArgs={'ContentType': 'image/png'}
-            )
-            logger.info(f"Upload complete: s3://{self.bucket_name}/{s3_key}")
 
-        except Exception as e:
-            logger.error(f"Error uploading thumbnail: {e}")
-            raise
+        if not result.stdout:
+            raise RuntimeError(f"ffmpeg produced no thumbnail for {s3_key}")
+        return result.stdout
 
     def check_thumbnail_exists(self, s3_key: str) -> bool:
         """
@@ -173,13 +204,15 @@ class ThumbnailGenerator:
         except:
             return False
 
-    def process_video(self, video_key: str, skip_existing: bool = True) -> Tuple[bool, str]:
+    def process_video(self, video_key: str, skip_existing: bool = True,
+                      existing_thumbnails: Optional[Set[str]] = None) -> Tuple[bool, str]:
         """
-        Process a single video: download, extract thumbnail, upload.
+        Process a single video: extract thumbnail straight from S3, upload.
 
         Args:
             video_key: S3 key of the video
             skip_existing: Skip if thumbnail already exists
+            existing_thumbnails: Thumbnail keys known to exist; checked instead of a HEAD request
 
         Returns:
             Tuple of (success, message)
@@ -188,54 +221,57 @@ class ThumbnailGenerator:
         thumbnail_key = video_key.rsplit('.', 1)[0] + '.png'
 
         # Check if thumbnail already exists
-        if skip_existing and self.check_thumbnail_exists(thumbnail_key):
+        if existing_thumbnails is not None:
+            thumbnail_exists = thumbnail_key in existing_thumbnails
+        else:
+            thumbnail_exists = skip_existing and self.check_thumbnail_exists(thumbnail_key)
+        if skip_existing and thumbnail_exists:
             msg = f"Thumbnail already exists, skipping: {thumbnail_key}"
             logger.info(msg)
             return True, msg
 
-        # Create temporary directory for processing
-        with tempfile.TemporaryDirectory() as temp_dir:
-            try:
-                # Local file paths
-                video_filename = os.path.basename(video_key)
-                thumbnail_filename = os.path.basename(thumbnail_key)
-
-                local_video = os.path.join(temp_dir, video_filename)
-                local_thumbnail = os.path.join(temp_dir, thumbnail_filename)
-
-                # Download video
-                self.download_video(video_key, local_video)
-
-                # Extract thumbnail
-                self.extract_thumbnail(local_video, local_thumbnail)
-
-                # Upload thumbnail
-                self.upload_thumbnail(local_thumbnail, thumbnail_key)
+        try:
+            # ffmpeg reads the video straight from S3 and writes the PNG to stdout, so
+            # neither the video nor the thumbnail touches local disk
+            png_bytes = self.extract_thumbnail_from_prefix(video_key)
+            if png_bytes is None:
+                # Index isn't at the front (no faststart), so let ffmpeg seek the whole object
+                png_bytes = self.extract_thumbnail_from_s3(video_key)
+
+            logger.info(f"Uploading thumbnail to {thumbnail_key}")
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=thumbnail_key,
+                Body=png_bytes,
+                ContentType='image/png'
+            )
 
-                msg = f"Successfully processed: {video_key} -> {thumbnail_key}"
-                logger.info(msg)
-                return True, msg
+            msg = f"Successfully processed: {video_key} -> {thumbnail_key}"
+            logger.info(msg)
+            return True, msg
 
-            except Exception as e:
-                msg = f"Failed to process {video_key}: {str(e)}"
-                logger.error(msg)
-                return False, msg
+        except Exception as e:
+            msg = f"Failed to process {video_key}: {str(e)}"
+            logger.error(msg)
+            return False, msg
 
-    def process_folder(self, folder_prefix: str, skip_existing: bool = True) -> dict:
+    def process_folder(self, folder_prefix: str, skip_existing: bool = True,
+                       max_workers: int = MAX_WORKERS) -> dict:
         """
-        Process all videos in a folder.
+        Process all videos in a folder, several at a time.
 
         Args:
             folder_prefix: S3 folder prefix
             skip_existing: Skip videos that already have thumbnails
+            max_workers: Number of videos processed concurrently
 
         Returns:
             Dictionary with processing results
         """
         logger.info(f"Processing folder: {folder_prefix}")
 
-        # List all videos
-        video_keys = self.list_videos(folder_prefix)
+        # List all videos, and the thumbnails that already exist
+        video_keys, existing_thumbnails = self.list_videos_and_thumbnails(folder_prefix)
 
         if not video_keys:
             logger.warning(f"No videos found in {folder_prefix}")
@@ -256,11 +292,15 @@ class ThumbnailGenerator:
             'results': []
         }
 
-        for i, video_key in enumerate(video_keys, 1):
+        def process(indexed_key):
+            i, video_key = indexed_key
             logger.info(f"Processing video {i}/{len(video_keys)}: {video_key}")
+            return self.process_video(video_key, skip_existing, existing_thumbnails)
 
-            success, msg = self.process_video(video_key, skip_existing)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(process, enumerate(video_keys, 1)))
 
+        for video_key, (success, msg) in zip(video_keys, outcomes):
             if success:
                 if 'already exists' in msg:
                     results['skipped'] += 1
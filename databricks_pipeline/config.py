@@ -1,12 +1,15 @@
 """
 Configuration management for analytics scraping.
 """
+import functools
 import logging
 import os
 import json
 from dataclasses import dataclass
 from typing import Dict, Any
 from dotenv import load_dotenv
+import boto3
+from botocore.config import Config
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -25,16 +28,28 @@ class ApifyConfig:
 
 # Input parameters of Apify Config stored as JSON. Refer to actor documentation
 REEL_SCRAPER_CONFIG_FILE = "reel_scraper_config_small.json" #TODO: Change back once done testing
-with open(REEL_SCRAPER_CONFIG_FILE, "r") as file:
-    reel_scraper_config = json.load(file)
 
-# Instagram reel scraping config setup
-IG_REEL_SCRAPING_CONFIG = ApifyConfig(
-    actor_name="apify/instagram-reel-scraper",
-    config_name="instagram_reels",
-    platform="instagram",
-    input_parameters=reel_scraper_config
-)
+@functools.lru_cache(maxsize=1)
+def get_reel_scraper_config() -> Dict[str, Any]:
+    """Read the reel scraper input parameters on first use, not at import."""
+    with open(REEL_SCRAPER_CONFIG_FILE, "r") as file:
+        return json.load(file)
+
+@functools.lru_cache(maxsize=1)
+def get_ig_reel_scraping_config() -> ApifyConfig:
+    """Instagram reel scraping config setup"""
+    return ApifyConfig(
+        actor_name="apify/instagram-reel-scraper",
+        config_name="instagram_reels",
+        platform="instagram",
+        input_parameters=get_reel_scraper_config()
+    )
+
+def __getattr__(name):
+    # Modules that only need credentials (e.g. on Spark executors) never read the scraper JSON
+    if name == "IG_REEL_SCRAPING_CONFIG":
+        return get_ig_reel_scraping_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Instagram account configuration for Instaloader fallback.
 INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME")
@@ -51,3 +66,16 @@ if not (AWS_ACCESS_KEY_ID or AWS_SECRET_ACCESS_KEY or S3_BASE_PATH or S3_BUCKET_
     logger.error("ERROR: S3 credentials not configured. No media can be uploaded to S3.")
     raise Exception("S3 credentials not configured. Set up credentials in .env file.")
 
+@functools.lru_cache(maxsize=1)
+def get_s3_client():
+    """
+    The S3 client for this process, created on first use. boto3 clients are thread-safe, so
+    every VideoProcessor, worker thread and Spark task in the process shares this one.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        endpoint_url=S3_BASE_PATH,
+        config=Config(max_pool_connections=64, retries={"max_attempts": 10, "mode": "adaptive"})
+    )
@@ -1,56 +1,47 @@
 import logging
 import os
 import time
+import hashlib
+import heapq
 import json
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from google import genai
+from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
 
+
+class SpeakerDescription(BaseModel):
+    appearance: str
+    gender: str
+    style: str
+    personality: str
+
+
+class TimestampEntry(BaseModel):
+    time: str = Field(description="Segment range, e.g. 00:16-00:45")
+    dialogue: str
+    tone: str
+    setting_description: str
+    key_visual_moments: str
+    action_context: str
+
+
+class VideoAnalysis(BaseModel):
+    speaker_description: SpeakerDescription
+    timestamps: list[TimestampEntry]
+
+
+# The JSON shape is enforced by VideoAnalysis as a response schema, so the prompt no longer
+# carries a worked JSON example
 VIDEO_ANALYSIS_PROMPT = """
-    Please give a detailed breakdown of the entire video, 
-    include the relevant timestamps and output in JSON List format.
-    Also please include what the individual speaker(s) were saying, the tone, any setting descriptions, key visual moments. 
-    Finally, at the base structure, give a speaker description detailing their appearance, gender, style, and personality.
-            
-    Provide similar JSON structure in this format:
-    {
-        "video_analysis": {
-            "speaker_description": {
-            "appearance": "Young adult male, approximately 25-30 years old, brown hair, casual attire",
-            "gender": "Male",
-            "style": "Casual gaming setup with RGB lighting, wearing a black hoodie",
-            "personality": "Energetic, enthusiastic, prone to excited outbursts during intense moments"
-            },
-            "timestamps": [
-            {
-                "time": "00:00-00:15",
-                "dialogue": "Hey everyone, welcome back to my channel! Today we're diving into this crazy new level.",
-                "tone": "Excited, welcoming",
-                "setting_description": "Gaming room with multiple monitors, LED strip lighting in background",
-                "key_visual_moments": "Player adjusts headset, gestures toward screen",
-                "action_context": "Introduction and setup"
-            },
-            {
-                "time": "00:16-00:45",
-                "dialogue": "Oh no, oh no, this is not going well... Wait, I think I can make this jump!",
-                "tone": "Anxious, then hopeful",
-                "setting_description": "Same gaming setup, player leaning forward intensely",
-                "key_visual_moments": "Close-up of concentrated facial expression, rapid hand movements",
-                "action_context": "Challenging gameplay sequence"
-            },
-            {
-                "time": "00:46-01:20",
-                "dialogue": "YES! Did you see that? That was absolutely insane!",
-                "tone": "Triumphant, elated",
-                "setting_description": "Player throws hands up in celebration",
-                "key_visual_moments": "Victory gesture, big smile, pointing at screen",
-                "action_context": "Successful completion of difficult section"
-            }
-            ]
-        }
-    }
+    Please give a detailed breakdown of the entire video, split into timestamped segments.
+    For each segment include what the individual speaker(s) were saying, the tone, any setting descriptions,
+    key visual moments and the action taking place.
+    Finally, give a speaker description detailing their appearance, gender, style, and personality.
 """
 
 
@@ -61,20 +52,76 @@ if not api_key:
 
 client = genai.Client(api_key=api_key)
 
+GEMINI_MODEL = "gemini-2.5-flash"
+GENERATION_CONFIG = {
+    'max_output_tokens': 8192,  # Ensure enough tokens for long responses
+}
+# Structured output: the video analysis comes back as JSON matching VideoAnalysis
+VIDEO_ANALYSIS_CONFIG = {
+    **GENERATION_CONFIG,
+    'response_mime_type': 'application/json',
+    'response_schema': VideoAnalysis,
+}
+
+# The uploaded video is cached server-side for both prompts of analyze_video, so the follow-up
+# does not re-ingest it; the TTL bounds storage charges if the cache is never deleted
+VIDEO_CACHE_TTL = "600s"
+
+# Videos analyzed at the same time by analyze_videos; uploads, processing polls and generation
+# are all network waits, so they overlap across threads
+ANALYSIS_WORKERS = 16
+
+# Finished analyses are stored as JSON files keyed by video content and prompt, so reruns skip
+# videos that were already analyzed. Point this at a Unity Catalog volume to share it across clusters
+ANALYSIS_CACHE_DIR = os.getenv("GEMINI_ANALYSIS_CACHE_DIR", ".gemini_analysis_cache")
+ANALYSIS_CACHE_FIELDS = ('video_analysis', 'performance_context', 'virality_analysis')
+
+# Batch jobs are queued server-side and can take minutes to hours to finish
+BATCH_POLL_SECONDS = 30
+BATCH_UPLOAD_WORKERS = 8
+BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
 
 def extract_post_id(post_url: str) -> str:
     """Extract post ID from Instagram URL."""
+    # Shared links carry tracking query strings (e.g. ?igsh=...), which would otherwise miss the index
+    parts = post_url.split('?', 1)[0].split('#', 1)[0].rstrip('/').split('/')
     try:
-        parts = post_url.rstrip('/').split('/')
         if 'p' in parts:
             p_index = parts.index('p')
             return parts[p_index + 1]
     except (IndexError, ValueError):
         pass
-    return post_url.rstrip('/').split('/')[-1]
+    return parts[-1]
+
 
+def build_post_index(labeled_data: list) -> dict:
+    """
+    Index labeled posts by the post ID parsed from their URL.
 
-def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = None, random_sample: bool = False) -> list:
+    If several posts share an ID, the first one wins.
+    """
+    post_index = {}
+    for post in labeled_data:
+        post_index.setdefault(extract_post_id(post.get("Post URL", "")), post)
+    return post_index
+
+
+def reservoir_sample(items, k: int) -> list:
+    """Uniformly sample up to k items from an iterable in one pass, holding only k at a time."""
+    sample = []
+    for seen, item in enumerate(items):
+        if seen < k:
+            sample.append(item)
+        else:
+            slot = random.randint(0, seen)
+            if slot < k:
+                sample[slot] = item
+    return sample
+
+
+def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = None, random_sample: bool = False,
+                             post_index: dict = None) -> list:
     """
     Get video files and match them with performance data from labeled_scraped_data.json.
 
@@ -83,6 +130,8 @@ def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = No
         labeled_data: List of post data from labeled_scraped_data.json
         limit: Maximum number of videos to return
         random_sample: If True, randomly sample videos; if False, sort by views and take top N
+        post_index: Optional index from build_post_index, so callers scanning several
+                    directories parse every post URL only once
 
     Returns:
         List of dicts with 'video_path' and 'metadata' keys
@@ -92,40 +141,140 @@ def get_videos_with_metadata(video_dir: str, labeled_data: list, limit: int = No
         logger.warning(f"Warning: {video_dir} does not exist")
         return []
 
-    video_files = list(video_path.glob("*.mp4"))
-    results = []
+    if post_index is None:
+        post_index = build_post_index(labeled_data)
+    def matched_videos():
+        # os.scandir reads file types from the directory entries instead of stat-ing every path
+        with os.scandir(video_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".mp4") or not entry.is_file():
+                    continue
+
+                # Video filename is the post ID (e.g., C8mtEPSp4b8.mp4)
+                post_id = entry.name[:-len(".mp4")]
+
+                # Find matching metadata in labeled data
+                metadata = post_index.get(post_id)
+
+                if metadata:
+                    yield {
+                        'video_path': entry.path,
+                        'post_id': post_id,
+                        'metadata': metadata
+                    }
+
+    # Matches are consumed as the directory is scanned, so with a limit only `limit` of them are held
+    if random_sample:
+        # Randomly sample videos
+        if limit:
+            return reservoir_sample(matched_videos(), limit)
+        return list(matched_videos())
+
+    # Sort by views (descending) to get top performers
+    # Handle None values in Views field
+    views_key = lambda x: x['metadata'].get('views') or 0
+    if limit:
+        # Partial selection is O(N log limit) instead of sorting every video
+        return heapq.nlargest(limit, matched_videos(), key=views_key)
+    return sorted(matched_videos(), key=views_key, reverse=True)
+
+
+def upload_video(video_path: str, post_id: str):
+    """Upload a video to the Gemini Files API and wait until it is ready to be prompted."""
+    myfile = client.files.upload(file=video_path)
+    # Poll with exponential backoff so short clips aren't held up by a fixed 5s sleep
+    delay = 0.5
+    while myfile.state == "PROCESSING":
+        logger.info(f"  Waiting for {post_id} to be processed...")
+        time.sleep(delay)
+        delay = min(delay * 1.5, 5.0)
+        myfile = client.files.get(name=myfile.name)
+    logger.info(f"  Video uploaded successfully: {myfile.state}")
+    return myfile
+
+
+def create_video_cache(myfile, post_id: str):
+    """
+    Cache an uploaded video for reuse across prompts.
 
-    for video_file in video_files:
-        # Video filename is the post ID (e.g., C8mtEPSp4b8.mp4)
-        post_id = video_file.stem
+    Returns:
+        The cache name, or None if caching failed (e.g. the clip is below the minimum cacheable size)
+    """
+    try:
+        cache = client.caches.create(
+            model=GEMINI_MODEL,
+            config={'contents': [myfile], 'ttl': VIDEO_CACHE_TTL},
+        )
+        return cache.name
+    except Exception as e:
+        logger.warning(f"  Could not cache {post_id}, sending the video with each prompt: {e}")
+        return None
 
-        # Find matching metadata in labeled data
-        metadata = None
-        for post in labeled_data:
-            post_url = post.get("Post URL", "")
-            if post_id in post_url:
-                metadata = post
-                break
 
-        if metadata:
-            results.append({
-                'video_path': str(video_file),
-                'post_id': post_id,
-                'metadata': metadata
-            })
+def delete_video_cache(cache_name: str) -> None:
+    """Delete a video cache once its prompts are done, to stop storage charges."""
+    try:
+        client.caches.delete(name=cache_name)
+    except Exception as e:
+        logger.warning(f"  Could not delete cache {cache_name}, it expires after {VIDEO_CACHE_TTL}: {e}")
 
-    if random_sample:
-        # Randomly sample videos
-        if limit and len(results) > limit:
-            results = random.sample(results, limit)
-    else:
-        # Sort by views (descending) to get top performers
-        # Handle None values in Views field
-        results.sort(key=lambda x: x['metadata'].get('views') or 0, reverse=True)
-        if limit:
-            results = results[:limit]
 
-    return results
+# (went_viral, outcome, engagement_level) wording of the follow-up prompt
+VIRAL_WORDING = ("went viral", "virality", "high")
+NOT_VIRAL_WORDING = ("did not go viral", "performance", "low")
+
+
+def build_performance_context(metadata: dict, video_analysis: str = None) -> str:
+    """
+    Build the follow-up prompt asking why a video did or did not go viral.
+
+    Without a video_analysis the prompt refers to the video itself, for requests that
+    are bound to a cache holding it.
+    """
+    # None-safe formatting
+    views = metadata.get('views') or 0
+    likes = metadata.get('likes') or 0
+    comments = metadata.get('comments') or 0
+    duration = metadata.get('duration') or 0
+    engagement_rate = (likes / max(views, 1)) * 100 if views else 0
+    went_viral, outcome, engagement_level = VIRAL_WORDING if metadata.get('viral') else NOT_VIRAL_WORDING
+    video_reference = (
+        f"The transcript and scenes of the video is: {video_analysis}"
+        if video_analysis is not None else "The video is attached above."
+    )
+
+    return f"""
+This video has the following performance metrics:
+- Is Viral: {metadata.get('viral', False)}
+- Views: {views:,.0f}
+- Likes: {likes:,}
+- Comments: {comments}
+- Duration: {duration} seconds
+- Caption: "{metadata.get('caption', '')}"
+- Engagement Rate: {engagement_rate:.2f}%
+- Date Posted: {metadata.get('date', '')}
+
+Based on the video analysis above and these performance metrics, explain why this video {went_viral}. What specific elements in the content, timing, format, or presentation contributed to its {engagement_level} engagement?
+
+Focus on what happened in the video, the implied comedy/other elements that contributed to its {outcome} and why.
+
+{video_reference}
+"""
+
+
+def _log_response_structure(response) -> None:
+    """Debug-log a response that came back without text, candidate by candidate."""
+    logger.debug("  Debugging response structure:")
+    response_dict = response.to_dict() if hasattr(response, 'to_dict') else str(response)
+    logger.debug("  Response dict: %s", json.dumps(response_dict, indent=2) if isinstance(response_dict, dict) else response_dict)
+
+    for idx, candidate in enumerate(getattr(response, 'candidates', None) or []):
+        logger.debug("  Candidate %s:", idx)
+        logger.debug("    - finish_reason: %s", getattr(candidate, 'finish_reason', 'N/A'))
+        if hasattr(candidate, 'safety_ratings'):
+            logger.debug("    - safety_ratings: %s", candidate.safety_ratings)
+        if hasattr(candidate, 'content'):
+            logger.debug("    - content: %s", candidate.content)
 
 
 def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
@@ -137,23 +286,25 @@ def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
     """
     logger.info(f"Analyzing {post_id}...")
 
+    cache_name = None
     try:
         # Upload video for analysis
-        myfile = client.files.upload(file=video_path)
-        while myfile.state == "PROCESSING":
-            logger.info(f"  Waiting for {post_id} to be processed...")
-            time.sleep(5)
-            myfile = client.files.get(name=myfile.name)
-        logger.info(f"  Video uploaded successfully: {myfile.state}")
+        myfile = upload_video(video_path, post_id)
+        cache_name = create_video_cache(myfile, post_id)
 
         # Get video content analysis with proper configuration
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[myfile, VIDEO_ANALYSIS_PROMPT],
-            config={
-                'max_output_tokens': 8192,  # Ensure enough tokens for long responses
-            }
-        )
+        if cache_name:
+            response = client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[VIDEO_ANALYSIS_PROMPT],
+                config={**VIDEO_ANALYSIS_CONFIG, 'cached_content': cache_name}
+            )
+        else:
+            response = client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[myfile, VIDEO_ANALYSIS_PROMPT],
+                config=VIDEO_ANALYSIS_CONFIG
+            )
 
         # Debug: Print response structure
         logger.info(f"  Response received for {post_id}")
@@ -173,20 +324,10 @@ def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
 
             # If text is None/empty, inspect the response object
             if not video_analysis:
-                logger.debug(f"  Debugging response structure:")
-                response_dict = response.to_dict() if hasattr(response, 'to_dict') else str(response)
-                logger.debug(f"  Response dict: {json.dumps(response_dict, indent=2) if isinstance(response_dict, dict) else response_dict}")
-
-                # Check candidates
-                if hasattr(response, 'candidates') and response.candidates:
-                    for idx, candidate in enumerate(response.candidates):
-                        logger.debug(f"  Candidate {idx}:")
-                        logger.debug(f"    - finish_reason: {candidate.finish_reason if hasattr(candidate, 'finish_reason') else 'N/A'}")
-                        if hasattr(candidate, 'safety_ratings'):
-                            logger.debug(f"    - safety_ratings: {candidate.safety_ratings}")
-                        if hasattr(candidate, 'content'):
-                            logger.debug(f"    - content: {candidate.content}")
-                else:
+                # Serializing the whole response is costly, so only do it when debug logs are shown
+                if logger.isEnabledFor(logging.DEBUG):
+                    _log_response_structure(response)
+                if not getattr(response, 'candidates', None):
                     logger.warning(f"  No candidates in response")
 
                 video_analysis = "Error: No valid content generated by API"
@@ -195,64 +336,52 @@ def analyze_video(video_path: str, metadata: dict, post_id: str) -> dict:
             video_analysis = "Error: No response from API"
 
     except Exception as e:
-        logger.error(f"  ✗ ERROR during video analysis for {post_id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        # logger.exception attaches the traceback, so it goes through the configured handlers
+        logger.exception(f"  ✗ ERROR during video analysis for {post_id}: {str(e)}")
         video_analysis = f"Error during analysis: {str(e)}"
 
-    # Build performance context with None-safe formatting
-    views = metadata.get('views') or 0
-    likes = metadata.get('likes') or 0
-    comments = metadata.get('comments') or 0
-    duration = metadata.get('duration') or 0
-    engagement_rate = (likes / max(views, 1)) * 100 if views else 0
-
-    performance_context = f"""
-This video has the following performance metrics:
-- Is Viral: {metadata.get('viral', False)}
-- Views: {views:,.0f}
-- Likes: {likes:,}
-- Comments: {comments}
-- Duration: {duration} seconds
-- Caption: "{metadata.get('caption', '')}"
-- Engagement Rate: {engagement_rate:.2f}%
-- Date Posted: {metadata.get('date', '')}
-
-Based on the video analysis above and these performance metrics, explain why this video {"went viral" if metadata.get('viral') else "did not go viral"}. What specific elements in the content, timing, format, or presentation contributed to its {"high" if metadata.get('viral') else "low"} engagement?
-
-Focus on what happened in the video, the implied comedy/other elements that contributed to its {"virality" if metadata.get('viral') else "performance"} and why.
-
-The transcript and scenes of the video is: {video_analysis}
-"""
+    if cache_name:
+        # The cached video stands in for the transcript, so it is not re-tokenized in the follow-up
+        performance_context = build_performance_context(metadata)
+        virality_config = {**GENERATION_CONFIG, 'cached_content': cache_name}
+    else:
+        performance_context = build_performance_context(metadata, video_analysis)
+        virality_config = GENERATION_CONFIG
 
     # Get virality analysis
     virality_analysis = None
     try:
-        virality_response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[performance_context],
-            config={
-                'max_output_tokens': 8192,
-            }
-        )
-
-        if virality_response:
-            try:
-                virality_analysis = virality_response.text
-                if virality_analysis:
-                    logger.info(f"  ✓ Virality analysis generated ({len(virality_analysis)} chars)")
-                else:
-                    logger.warning(f"  ✗ virality_response.text is empty")
-                    virality_analysis = "Error: No virality analysis generated"
-            except Exception as text_error:
-                logger.error(f"  ✗ Error accessing virality_response.text: {text_error}")
-                virality_analysis = f"Error accessing text: {text_error}"
+        if video_analysis.startswith("Error"):
+            # The follow-up would only explain an error message, so don't spend a generation on it
+            logger.warning(f"  Skipping virality analysis for {post_id}: video analysis failed")
+            virality_analysis = "Skipped: upstream analysis failed"
         else:
-            virality_analysis = "Error: No virality response from API"
+            virality_response = client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[performance_context],
+                config=virality_config
+            )
+
+            if virality_response:
+                try:
+                    virality_analysis = virality_response.text
+                    if virality_analysis:
+                        logger.info(f"  ✓ Virality analysis generated ({len(virality_analysis)} chars)")
+                    else:
+                        logger.warning(f"  ✗ virality_response.text is empty")
+                        virality_analysis = "Error: No virality analysis generated"
+                except Exception as text_error:
+                    logger.error(f"  ✗ Error accessing virality_response.text: {text_error}")
+                    virality_analysis = f"Error accessing text: {text_error}"
+            else:
+                virality_analysis = "Error: No virality response from API"
 
     except Exception as e:
         logger.error(f"  ✗ ERROR during virality analysis for {post_id}: {str(e)}")
         virality_analysis = f"Error during virality analysis: {str(e)}"
+    finally:
+        if cache_name:
+            delete_video_cache(cache_name)
 
     logger.info(f"  Completed analysis for {post_id}")
 
@@ -265,4 +394,183 @@ The transcript and scenes of the video is: {video_analysis}
         'virality_analysis': virality_analysis
     }
 
+def analyze_videos(items: list, max_workers: int = ANALYSIS_WORKERS) -> list:
+    """
+    Analyze several videos concurrently using Gemini API.
+
+    Args:
+        items: Dicts with 'video_path', 'post_id' and 'metadata' keys (see get_videos_with_metadata)
+        max_workers: Maximum number of videos uploaded and analyzed at the same time
+
+    Returns:
+        List of analysis dicts from analyze_video, in the same order as `items`
+    """
+    def analyze(item):
+        return analyze_video(item['video_path'], item['metadata'], item['post_id'])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(analyze, items))
+
+
+def _file_sha256(path: str) -> str:
+    """Hash a file in 1MB chunks without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _analysis_cache_path(video_path: str, metadata: dict) -> Path:
+    """
+    The analysis depends on the video and on both prompts. Hashing the rendered prompts covers
+    the metadata they quote and any edit to the prompt text itself.
+    """
+    prompt_hash = hashlib.sha256(
+        (VIDEO_ANALYSIS_PROMPT + build_performance_context(metadata, "")).encode("utf-8")
+    ).hexdigest()
+    return Path(ANALYSIS_CACHE_DIR) / f"{_file_sha256(video_path)}-{prompt_hash}.json"
+
+
+def analyze_video_cached(video_path: str, metadata: dict, post_id: str) -> dict:
+    """
+    Same as analyze_video, but returns a stored result when this exact video was analyzed
+    with the same prompts before. Failed or skipped analyses are not stored, so they are
+    retried next run.
+    """
+    cache_path = _analysis_cache_path(video_path, metadata)
+    try:
+        cached_fields = json.loads(cache_path.read_text(encoding="utf-8"))
+        logger.info(f"Using cached analysis for {post_id}")
+        return {'post_id': post_id, 'video_path': video_path, 'metadata': metadata, **cached_fields}
+    except FileNotFoundError:
+        pass
+
+    analysis = analyze_video(video_path, metadata, post_id)
+
+    cached_fields = {field: analysis[field] for field in ANALYSIS_CACHE_FIELDS}
+    if not any(str(value).startswith(("Error", "Skipped")) for value in cached_fields.values()):
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so a concurrent reader never sees a half-written file
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(json.dumps(cached_fields), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"  Could not cache analysis for {post_id}: {e}")
+    return analysis
+
+
+def run_batch_job(requests: list, display_name: str) -> list:
+    """
+    Submit inline generate_content requests as one Gemini batch job and wait for it.
+
+    Returns:
+        One response text per request, in request order; failed entries become "Error: ..." strings
+    """
+    job = client.batches.create(
+        model=GEMINI_MODEL,
+        src=requests,
+        config={'display_name': display_name},
+    )
+    logger.info(f"Submitted batch job {job.name} with {len(requests)} requests")
+
+    while job.state.name not in BATCH_DONE_STATES:
+        time.sleep(BATCH_POLL_SECONDS)
+        job = client.batches.get(name=job.name)
+    logger.info(f"Batch job {job.name} finished: {job.state.name}")
+
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        return [f"Error: batch job {job.state.name}"] * len(requests)
+
+    texts = []
+    for entry in job.dest.inlined_responses:
+        if entry.error or not entry.response:
+            texts.append(f"Error during analysis: {entry.error}")
+            continue
+        try:
+            texts.append(entry.response.text or "Error: No valid content generated by API")
+        except Exception as text_error:
+            texts.append(f"Error accessing text: {text_error}")
+    return texts
+
+
+def analyze_videos_batch(items: list) -> list:
+    """
+    Analyze many videos through the Gemini Batch API instead of two live calls per video.
+
+    The batch endpoint is billed at a discount and schedules the whole corpus at once, so it
+    suits large backfills; analyze_video remains the faster path for a handful of videos.
+
+    Args:
+        items: Dicts with 'video_path', 'post_id' and 'metadata' keys (see get_videos_with_metadata)
+
+    Returns:
+        List of analysis dicts shaped like analyze_video's, in the same order as `items`
+    """
+    if not items:
+        return []
+
+    def upload(item):
+        try:
+            return upload_video(item['video_path'], item['post_id'])
+        except Exception as e:
+            logger.error(f"  ✗ ERROR uploading {item['post_id']}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=BATCH_UPLOAD_WORKERS) as executor:
+        files = list(executor.map(upload, items))
+
+    # First batch: one video analysis request per uploaded video
+    uploaded = [i for i, f in enumerate(files) if f is not None]
+    analysis_requests = [
+        {
+            'contents': [{
+                'parts': [
+                    {'file_data': {'file_uri': files[i].uri, 'mime_type': files[i].mime_type}},
+                    {'text': VIDEO_ANALYSIS_PROMPT},
+                ],
+                'role': 'user',
+            }],
+            'config': VIDEO_ANALYSIS_CONFIG,
+        }
+        for i in uploaded
+    ]
+    video_analyses = ["Error during analysis: video upload failed"] * len(items)
+    if analysis_requests:
+        for i, text in zip(uploaded, run_batch_job(analysis_requests, "video-analysis")):
+            video_analyses[i] = text
+
+    # Second batch: the virality follow-ups, which need the analyses from the first
+    performance_contexts = [
+        build_performance_context(item['metadata'], analysis)
+        for item, analysis in zip(items, video_analyses)
+    ]
+    # Failed analyses are skipped, as in analyze_video
+    analyzed = [i for i, analysis in enumerate(video_analyses) if not analysis.startswith("Error")]
+    virality_requests = [
+        {
+            'contents': [{'parts': [{'text': performance_contexts[i]}], 'role': 'user'}],
+            'config': GENERATION_CONFIG,
+        }
+        for i in analyzed
+    ]
+    virality_analyses = ["Skipped: upstream analysis failed"] * len(items)
+    if virality_requests:
+        for i, text in zip(analyzed, run_batch_job(virality_requests, "virality-analysis")):
+            virality_analyses[i] = text
+
+    return [
+        {
+            'post_id': item['post_id'],
+            'video_path': item['video_path'],
+            'metadata': item['metadata'],
+            'video_analysis': video_analysis,
+            'performance_context': performance_context,
+            'virality_analysis': virality_analysis
+        }
+        for item, video_analysis, performance_context, virality_analysis
+        in zip(items, video_analyses, performance_contexts, virality_analyses)
+    ]
+
 #TODO: we need to be able to do the observations and hypotheses here as well, then integrate with probably the gold_gemini_analysis part
\ No newline at end of file
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def _ensure_numeric(series, default=0):
@@ -11,40 +12,45 @@ def compute_engagement(df):
 
     # --- 2. Coerce key numeric columns ---
     numeric_cols = ['likes', 'views', 'comments', 'duration']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = _ensure_numeric(df[col], default=0)
-        else:
-            df[col] = 0  # create missing columns as zeros
+    # One assign instead of a column write per field; missing columns are created as zeros
+    df = df.assign(**{
+        col: _ensure_numeric(df[col], default=0) if col in df.columns else 0
+        for col in numeric_cols
+    })
 
     # --- 3. Sort (latest first) ---
+    # This is the only pass that compares usernames; every later step works on the resulting
+    # contiguous per-user blocks by position, instead of grouping (and hashing) the strings again
     df = df.sort_values(['username', 'date'], ascending=[True, False])
 
-    # --- 4. Rank posts (latest = 1, oldest = n) ---
-    df['post_number'] = df.groupby('username').cumcount() + 1
-
-    # --- 5. Filter out accounts with <30 posts ---
-    df = df.groupby('username').filter(lambda x: len(x) >= 1)
-
-    # --- 6. Sort by username and chronological post_number ---
-    df = df.sort_values(['username', 'post_number']).reset_index(drop=True)
-
-    # --- 7. Compute average likes of next 50 posts (look-ahead rolling mean) ---
-    def avg_next_50(likes):
-        return likes[::-1].rolling(window=50, min_periods=50).mean()[::-1].shift(-1)
-
-    df['avg_last_50'] = (
-        df.groupby('username', group_keys=False)['likes']
-        .apply(avg_next_50)
-    )
-
-    # --- 8. Label viral posts (likes > 115% of avg_next_50) ---
+    # --- 4. Filter out posts without an account ---
+    df = df[df['username'].notna()].reset_index(drop=True)
+
+    # --- 5. Rank posts (latest = 1, oldest = n) ---
+    usernames = df['username'].to_numpy()
+    positions = np.arange(len(df))
+    new_user = np.ones(len(df), dtype=bool)
+    new_user[1:] = usernames[1:] != usernames[:-1]
+    block_starts = np.flatnonzero(new_user)
+    block_ends = np.append(block_starts[1:], len(df))
+    block = np.cumsum(new_user) - 1
+    user_start, user_end = block_starts[block], block_ends[block]
+    df['post_number'] = positions - user_start + 1
+
+    # --- 6. Compute average likes of next 50 posts (look-ahead rolling mean) ---
+    # Window sums come from one cumulative sum over the whole column: the 50 posts after
+    # row i sum to csum[i + 51] - csum[i + 1] (exact, as likes are whole counts). A window
+    # only counts if it ends inside the row's own user block
+    likes = df['likes'].to_numpy(dtype=np.float64)
+    csum = np.concatenate(([0.0], np.cumsum(likes)))
+    window_end = positions + 51
+    window_sum = csum[np.minimum(window_end, len(df))] - csum[positions + 1]
+    df['avg_last_50'] = np.where(window_end <= user_end, window_sum / 50, np.nan)
+
+    # --- 7. Label viral posts (likes > 115% of avg_next_50) ---
     df['viral'] = (df['likes'] > df['avg_last_50'] * 1.15).astype(int)
 
-    # --- 9. Limit to first 50 posts per user ---
-    df = df.groupby('username').head(50)
-
-    # --- 10. Verification output ---
-    print(df[['username', 'post_number', 'likes', 'avg_last_50', 'viral']])
+    # --- 8. Limit to first 50 posts per user ---
+    df = df[df['post_number'] <= 50]
 
     return df
\ No newline at end of file
@@ -1,20 +1,87 @@
 import logging
 import os
+import random
+import time
 import pandas as pd
 import requests
 import instaloader
-import boto3
+import threading
+from collections import OrderedDict
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config import (
     INSTAGRAM_USERNAME, 
     INSTAGRAM_PASSWORD,
-    AWS_ACCESS_KEY_ID,
-    AWS_SECRET_ACCESS_KEY,
-    S3_BASE_PATH,
-    S3_BUCKET_PATH
+    S3_BUCKET_PATH,
+    get_s3_client
 )
 
 # Setup logging
 logger = logging.getLogger(__name__)
+
+# Videos uploaded at the same time by upload_video_df. The threads only wait on the CDN and S3,
+# so this can go well past the core count; keep it within the HTTP and S3 connection pools (64)
+UPLOAD_WORKERS = int(os.getenv("VIDEO_UPLOAD_WORKERS", "32"))
+
+MB = 1024 * 1024
+
+# Streamed reels are buffered one 8MB part at a time. Parallelism comes from UPLOAD_WORKERS,
+# so each upload only gets a few part threads
+TRANSFER_CFG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=8 * MB,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+# Fresh CDN URLs resolved through Instaloader, reused until the CDN links are likely to expire.
+# Module-level so every VideoProcessor in the same Python worker shares them
+MEDIA_URL_CACHE_TTL_SECONDS = 3600
+MEDIA_URL_CACHE_MAX_ENTRIES = 4096
+_media_url_cache = OrderedDict()  # post_id -> (media_url, fetched_at)
+_media_url_cache_lock = threading.Lock()
+
+# Instaloader lookups are retried once after a short randomized pause
+INSTALOADER_ATTEMPTS = 2
+
+# Statuses the CDN answers for expired media links; only these are worth an Instaloader lookup
+EXPIRED_URL_STATUS_CODES = {403, 404, 410}
+
+def _cached_media_url(post_id: str) -> str:
+    """Return a cached media URL for post_id if it is still fresh, else None."""
+    with _media_url_cache_lock:
+        entry = _media_url_cache.get(post_id)
+        if entry is None:
+            return None
+        media_url, fetched_at = entry
+        if time.monotonic() - fetched_at > MEDIA_URL_CACHE_TTL_SECONDS:
+            del _media_url_cache[post_id]
+            return None
+        return media_url
+
+def _cache_media_url(post_id: str, media_url: str) -> None:
+    with _media_url_cache_lock:
+        _media_url_cache[post_id] = (media_url, time.monotonic())
+        _media_url_cache.move_to_end(post_id)
+        while len(_media_url_cache) > MEDIA_URL_CACHE_MAX_ENTRIES:
+            _media_url_cache.popitem(last=False)
+
+# One VideoProcessor per Python worker, reused by every Spark task the worker runs. Its
+# constructor logs in to Instagram, and a fresh login per partition from many executors at once
+# gets the account checkpointed
+_shared_processor = None
+_shared_processor_lock = threading.Lock()
+
+def get_shared_video_processor() -> "VideoProcessor":
+    """Return this process's VideoProcessor, creating (and logging in) on first use."""
+    global _shared_processor
+    with _shared_processor_lock:
+        if _shared_processor is None:
+            _shared_processor = VideoProcessor()
+        return _shared_processor
+
 class VideoProcessor:
     """
     A processor for processing Instagram Reels videos from URLs in pandas DataFrames.
@@ -50,13 +117,16 @@ class VideoProcessor:
             INSTAGRAM_USERNAME (str, optional): Instagram account username for login.
             INSTAGRAM_PASSWORD (str, optional): Instagram account password for login.
         """
+        # Pooled keep-alive connections to the CDN, retrying throttled/transient failures. Every
+        # upload thread needs its own connection, or the pool discards and re-handshakes them
+        self._loader_lock = threading.Lock()
         self.session = requests.Session()
-        self.s3 = boto3.client(
-            "s3",
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            endpoint_url=S3_BASE_PATH
-        )
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=max(64, UPLOAD_WORKERS),
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        ))
+        self.s3 = get_s3_client()
         loader = instaloader.Instaloader()
         if INSTAGRAM_USERNAME and INSTAGRAM_PASSWORD:
             try:
@@ -87,21 +157,32 @@ class VideoProcessor:
             str: Latest media CDN URL (e.g. 'https://scontent-atl3-3.cdninstagram...'),
                  or empty string if fetching fails.
         """
+        cached_url = _cached_media_url(post_id)
+        if cached_url:
+            return cached_url
+
         L = self.loader
-        try:
-            post = instaloader.Post.from_shortcode(L.context, post_id)
-        except Exception as e:
-            logger.warning(f"❌ Failed to fetch post {post_id}: {e}")
-            return ""
-        return post.video_url
+        for attempt in range(INSTALOADER_ATTEMPTS):
+            try:
+                # Instaloader's context isn't thread-safe, so fallback lookups go one at a time
+                with self._loader_lock:
+                    post = instaloader.Post.from_shortcode(L.context, post_id)
+                    media_url = post.video_url
+                _cache_media_url(post_id, media_url)
+                return media_url
+            except Exception as e:
+                logger.warning(f"❌ Failed to fetch post {post_id}: {e}")
+                if attempt < INSTALOADER_ATTEMPTS - 1:
+                    time.sleep(random.uniform(0.5, 1.5))
+        return ""
 
     def _upload_video(self, post_id: str, media_url: str) -> tuple:
         """
         Retrieve an Instagram video and upload it to S3 as an mp4 file.
         
-        Attempts to read bytes content from the provided media_url first. If that fails (e.g., due to
-        URL expiration), falls back to using Instaloader to fetch a fresh media URL and
-        retries the upload.
+        Attempts to read bytes content from the provided media_url first. If that fails because the
+        URL has expired (403/404/410) or the connection failed, falls back to using Instaloader to
+        fetch a fresh media URL and retries the upload. Other HTTP errors are returned as-is.
 
         Args:
             post_id (str): Instagram reel ID, e.g. 'C8mtEPSp4b8'
@@ -118,37 +199,47 @@ class VideoProcessor:
             """
             Gets the byte content from a media url and puts it in S3, returning the status code
             """
-            response = self.session.get(media_url)
-            # Raise an exception for bad status codes (4xx or 5xx)
-            response.raise_for_status()  
-            video_bytes = response.content
-            try:
-                self.s3.put_object(
-                    Bucket=S3_BUCKET_PATH,
-                    Key=post_id,
-                    Body=video_bytes,
-                    ContentType="video/mp4"
-                )
-            except Exception as e:
-                logger.error(f"Failed to put object in S3: {e}")
-                return (response.status_code, False)
-            return (response.status_code, True)
+            with self.session.get(media_url, stream=True, timeout=(5, 30)) as response:
+                # Raise an exception for bad status codes (4xx or 5xx)
+                response.raise_for_status()
+                # Stream the body into a multipart upload instead of holding the whole video in memory
+                response.raw.decode_content = True
+                try:
+                    self.s3.upload_fileobj(
+                        response.raw,
+                        S3_BUCKET_PATH,
+                        post_id,
+                        ExtraArgs={"ContentType": "video/mp4"},
+                        Config=TRANSFER_CFG
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to put object in S3: {e}")
+                    return (response.status_code, False)
+                return (response.status_code, True)
 
         try:
-            # Try with main media URL
+            # Try with main media URL (5xx and throttling are already retried by the session)
             logger.debug("Direct request without using instaloader")
-            status_code, s3_upload_flag = upload_to_s3(post_id, media_url)
-        except:
-            try:
-                # Fallback to latest media URL using instaloader
-                logger.debug("Using instaloader to get latest media URL")
-                latest_media_url = self._get_latest_medial_url(post_id)
-                status_code, s3_upload_flag = upload_to_s3(post_id, latest_media_url)
-            except:
-                # Both methods unable to access instagram media URL
-                status_code = 404
-                s3_upload_flag = False
-        return (status_code, s3_upload_flag)
+            return upload_to_s3(post_id, media_url)
+        except requests.HTTPError as e:
+            status_code = e.response.status_code
+            if status_code not in EXPIRED_URL_STATUS_CODES:
+                # The link itself is fine, so a fresh URL from Instaloader would fail the same way
+                logger.warning(f"❌ Video {post_id} request failed with status {status_code}")
+                return (status_code, False)
+        except requests.RequestException as e:
+            logger.debug(f"Direct request for {post_id} failed: {e}")
+
+        try:
+            # Fallback to latest media URL using instaloader
+            logger.debug("Using instaloader to get latest media URL")
+            latest_media_url = self._get_latest_medial_url(post_id)
+            if latest_media_url:
+                return upload_to_s3(post_id, latest_media_url)
+        except requests.RequestException as e:
+            logger.debug(f"Instaloader media URL for {post_id} failed: {e}")
+        # Both methods unable to access instagram media URL
+        return (404, False)
 
     # ---------------- Main Function ----------------
 
@@ -180,24 +271,20 @@ class VideoProcessor:
             - Logs progress and failure information
         """
         df = df.copy()
-        status_codes = []
-        s3_upload_flags = []
-        failed = 0
-        uploaded = 0
-        processed = 0
-        for row in df.itertuples():
-            status_code, s3_upload_flag = self._upload_video(
-                post_id=getattr(row, post_id_col), 
-                media_url=getattr(row, media_url_col)
-            )
-            status_codes.append(status_code)
-            s3_upload_flags.append(s3_upload_flag)
+        # Pull the two columns out once and upload concurrently; each upload is network-bound
+        post_ids = df[post_id_col].tolist()
+        media_urls = df[media_url_col].tolist()
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            outcomes = list(executor.map(self._upload_video, post_ids, media_urls))
+        # Transpose the (status_code, s3_upload_flag) pairs in one pass
+        status_codes, s3_upload_flags = (list(column) for column in zip(*outcomes)) if outcomes else ([], [])
+
+        for post_id, s3_upload_flag in zip(post_ids, s3_upload_flags):
             if not s3_upload_flag:
-                failed += 1
-                logger.warning(f"❌ Video {getattr(row, post_id_col)} failed to upload")
-            else:
-                uploaded += 1
-            processed += 1
+                logger.warning(f"❌ Video {post_id} failed to upload")
+        processed = len(outcomes)
+        uploaded = sum(s3_upload_flags)
+        failed = processed - uploaded
         
         df["status_code"] = status_codes
         df["s3_upload_flag"] = s3_upload_flags
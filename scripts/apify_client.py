@@ -150,8 +150,14 @@ class ApifyClient:
     def get_run_dataset(self, run_id: str, 
                        format: str = "json",
                        clean: bool = True,
-                       limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get dataset items from a completed run."""
+                       limit: Optional[int] = None,
+                       fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get dataset items from a completed run.
+
+        Pass `fields` to have Apify return only those keys of each item, instead of
+        downloading and parsing every field of a large dataset.
+        """
         # First get the run info to find dataset ID
         run_info = self.get_run_status(run_id)
         dataset_id = run_info['data']['defaultDatasetId']
@@ -165,6 +171,8 @@ class ApifyClient:
         
         if limit:
             params["limit"] = limit
+        if fields:
+            params["fields"] = ",".join(fields)
             
         try:
             response = self.session.get(url, params=params)
@@ -2,14 +2,15 @@
 Configuration management for TikTok analytics scraping.
 """
 import os
-from dataclasses import dataclass
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Dict, List
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-@dataclass
+# Frozen so the Apify payload can be built once; not slotted, which would need Python 3.10
+@dataclass(frozen=True)
 class ScrapingConfig:
     """Configuration for TikTok scraping parameters."""
     search_queries: List[str]
@@ -23,41 +24,54 @@ class ScrapingConfig:
     should_download_music_covers: bool = False
     search_section: str = "/video"
     proxy_country_code: str = "US"
+    _apify_input: Dict[str, Any] = field(init=False, repr=False, compare=False)
+
+    # Dataclass field -> Apify actor input key
+    APIFY_FIELD_MAP: ClassVar[Dict[str, str]] = {
+        "search_queries": "searchQueries",
+        "hashtags": "hashtags",
+        "results_per_page": "resultsPerPage",
+        "should_download_videos": "shouldDownloadVideos",
+        "should_download_covers": "shouldDownloadCovers",
+        "should_download_subtitles": "shouldDownloadSubtitles",
+        "should_download_slideshow_images": "shouldDownloadSlideshowImages",
+        "should_download_avatars": "shouldDownloadAvatars",
+        "should_download_music_covers": "shouldDownloadMusicCovers",
+        "search_section": "searchSection",
+        "proxy_country_code": "proxyCountryCode"
+    }
+
+    def __post_init__(self):
+        apify_input = {apify_key: getattr(self, name) for name, apify_key in self.APIFY_FIELD_MAP.items()}
+        object.__setattr__(self, "_apify_input", apify_input)
 
     def to_apify_input(self) -> Dict[str, Any]:
-        """Convert config to Apify API input format."""
-        return {
-            "searchQueries": self.search_queries,
-            "hashtags": self.hashtags,
-            "resultsPerPage": self.results_per_page,
-            "shouldDownloadVideos": self.should_download_videos,
-            "shouldDownloadCovers": self.should_download_covers,
-            "shouldDownloadSubtitles": self.should_download_subtitles,
-            "shouldDownloadSlideshowImages": self.should_download_slideshow_images,
-            "shouldDownloadAvatars": self.should_download_avatars,
-            "shouldDownloadMusicCovers": self.should_download_music_covers,
-            "searchSection": self.search_section,
-            "proxyCountryCode": self.proxy_country_code
-        }
+        """Convert config to Apify API input format (shared dict; treat as read-only)."""
+        return self._apify_input
+
+# Read once at import; every tier builds its own ApifyClient and APIConfig
+_API_TOKEN = os.getenv("APIFY_API_TOKEN")
+_ACTOR_ID = os.getenv("TIKTOK_ACTOR_ID", "clockworks~tiktok-scraper")
 
 class APIConfig:
     """Apify API configuration."""
     
     def __init__(self):
-        self.api_token = os.getenv("APIFY_API_TOKEN")
+        self.api_token = _API_TOKEN
         if not self.api_token:
             raise ValueError("APIFY_API_TOKEN environment variable is required")
         
-        self.tiktok_actor_id = os.getenv("TIKTOK_ACTOR_ID", "clockworks~tiktok-scraper")
+        self.tiktok_actor_id = _ACTOR_ID
         self.base_url = "https://api.apify.com/v2"
+        self._headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json"
+        }
         
     @property
     def headers(self) -> Dict[str, str]:
         """Get API headers."""
-        return {
-            "Authorization": f"Bearer {self.api_token}",
-            "Content-Type": "application/json"
-        }
+        return self._headers
 
 # Tier 1: Broad FYP Content
 TIER1_CONFIG = ScrapingConfig(
@@ -3,64 +3,121 @@ Data processing and analysis utilities for TikTok scraping results.
 """
 import json
 import os
-import pandas as pd
+import threading
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import orjson
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, NamedTuple, Optional, Tuple
 import logging
 
 from apify_client import ScrapingResult
 
+# pandas and numpy are imported inside the functions that use them, so CLI runs that never
+# reach the analysis code (--help, empty results) skip their import cost
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Pretty-printed like json.dump(indent=2, ensure_ascii=False), but serialized in C in one pass
+ORJSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Saved file names end in a timestamp. main.run_complete_analysis passes its start time to every
+# save so the files of one run share a stamp; saves without one use the current time
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+# Save metadata is appended to one JSONL log per data directory instead of a small file per save;
+# TIKTOK_PER_SAVE_METADATA=1 also writes the old per-save _metadata.json files
+METADATA_LOG_NAME = "run_metadata.jsonl"
+PER_SAVE_METADATA = os.getenv("TIKTOK_PER_SAVE_METADATA", "0") == "1"
+_metadata_log_lock = threading.Lock()
+
+# Formats written by save_scraping_results. Nothing in the pipeline reads the CSV back, so it is
+# opt-in: the CLIs' --csv flag passes ("json", "csv") down to the saves
+DEFAULT_SAVE_FORMATS = ("json",)
+
+def _file_timestamp(timestamp: Optional[str] = None) -> str:
+    """Timestamp used in saved file names: the caller's run timestamp, else the current time."""
+    return timestamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+
+class DataDirs(NamedTuple):
+    """The data directory and its subdirectories."""
+    root: Path
+    raw: Path
+    processed: Path
+    analysis: Path
+
 def ensure_data_directory() -> Path:
     """Ensure data directory exists and return path."""
-    data_dir = Path(os.getenv("TIKTOK_DATA_DIR", "data"))
-    data_dir.mkdir(exist_ok=True)
+    return _data_dirs().root
+
+def _data_dirs() -> DataDirs:
+    """Ensure the data directory tree exists and return its paths."""
+    # tier_scraper sets TIKTOK_DATA_DIR from --output-dir, so the env var is the cache key
+    return _create_data_directory(os.getenv("TIKTOK_DATA_DIR", "data"))
+
+@lru_cache(maxsize=None)
+def _create_data_directory(data_dir_name: str) -> DataDirs:
+    """Create the data directory tree once per process and return its paths."""
+    data_dir = Path(data_dir_name)
+    dirs = DataDirs(data_dir, data_dir / "raw", data_dir / "processed", data_dir / "analysis")
     
-    # Create subdirectories
-    (data_dir / "raw").mkdir(exist_ok=True)
-    (data_dir / "processed").mkdir(exist_ok=True)
-    (data_dir / "analysis").mkdir(exist_ok=True)
+    for directory in dirs:
+        directory.mkdir(exist_ok=True)
     
-    return data_dir
+    return dirs
 
-def save_scraping_results(result: ScrapingResult, filename_prefix: str) -> Dict[str, Path]:
+def save_scraping_results(result: ScrapingResult, filename_prefix: str,
+                          formats: Tuple[str, ...] = DEFAULT_SAVE_FORMATS,
+                          timestamp: Optional[str] = None) -> Dict[str, Path]:
     """
     Save scraping results in multiple formats.
     
     Args:
         result: ScrapingResult object
         filename_prefix: Prefix for output files
+        formats: Formats to write; JSON is always written, CSV only if "csv" is listed
+        timestamp: Run timestamp for the file names (defaults to the current time)
         
     Returns:
         Dictionary with format -> file path mappings
     """
-    data_dir = ensure_data_directory()
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    raw_dir = _data_dirs().raw
+    timestamp = _file_timestamp(timestamp)
     
     # Generate filenames
-    json_file = data_dir / "raw" / f"{filename_prefix}_{timestamp}.json"
-    csv_file = data_dir / "raw" / f"{filename_prefix}_{timestamp}.csv"
-    metadata_file = data_dir / "raw" / f"{filename_prefix}_{timestamp}_metadata.json"
+    json_file = raw_dir / f"{filename_prefix}_{timestamp}.json"
+    csv_file = raw_dir / f"{filename_prefix}_{timestamp}.csv"
+    metadata_file = raw_dir / f"{filename_prefix}_{timestamp}_metadata.json"
+    metadata_log = raw_dir / METADATA_LOG_NAME
     
     saved_files = {}
     
     try:
-        # Save raw JSON data
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(result.data, f, indent=2, ensure_ascii=False)
+        # Save raw JSON data. The disk write releases the GIL, so it runs in the background
+        # while the CSV is being built
+        json_bytes = orjson.dumps(result.data, option=ORJSON_OPTIONS)
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            json_written = writer.submit(json_file.write_bytes, json_bytes)
+            
+            # Save as CSV if requested and data exists
+            if "csv" in formats and result.data:
+                import pandas as pd
+                df = pd.json_normalize(result.data)
+                _write_csv(df, csv_file)
+                saved_files['csv'] = csv_file
+                logger.info(f"💾 Saved CSV data: {csv_file}")
+            
+            json_written.result()
         saved_files['json'] = json_file
         logger.info(f"💾 Saved JSON data: {json_file}")
         
-        # Save as CSV if data exists
-        if result.data:
-            df = pd.json_normalize(result.data)
-            df.to_csv(csv_file, index=False, encoding='utf-8')
-            saved_files['csv'] = csv_file
-            logger.info(f"💾 Saved CSV data: {csv_file}")
-        
         # Save metadata
         metadata = {
             "tier": result.tier,
@@ -73,10 +130,17 @@ def save_scraping_results(result: ScrapingResult, filename_prefix: str) -> Dict[
             }
         }
         
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2)
-        saved_files['metadata'] = metadata_file
-        logger.info(f"💾 Saved metadata: {metadata_file}")
+        # One line per save in a shared log; tiers save from parallel threads, hence the lock
+        with _metadata_log_lock, open(metadata_log, 'ab') as f:
+            f.write(orjson.dumps(metadata) + b"\n")
+        saved_files['metadata'] = metadata_log
+        logger.info(f"💾 Appended metadata: {metadata_log}")
+        
+        if PER_SAVE_METADATA:
+            with open(metadata_file, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2)
+            saved_files['metadata_file'] = metadata_file
+            logger.info(f"💾 Saved metadata: {metadata_file}")
         
         return saved_files
         
@@ -84,6 +148,91 @@ def save_scraping_results(result: ScrapingResult, filename_prefix: str) -> Dict[
         logger.error(f"❌ Failed to save results: {str(e)}")
         raise
 
+_MISSING = object()
+
+# Fields read by analyze_engagement_metrics and extract_content_patterns; the comparison
+# report looks up their union once per tier
+ENGAGEMENT_COLS = ['diggCount', 'shareCount', 'commentCount', 'playCount']
+ENGAGEMENT_FIELDS = ENGAGEMENT_COLS + ['webVideoUrl', 'text']
+CONTENT_PATTERN_FIELDS = ['text', 'author.nickname', 'video.duration']
+REPORT_FIELDS = list(dict.fromkeys(ENGAGEMENT_FIELDS + CONTENT_PATTERN_FIELDS))
+TOP_VIDEOS_COUNT = 10
+
+def _csv_cell(value: Any) -> Any:
+    """Render an object-column cell the way DataFrame.to_csv would (lists/dicts as str)."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value != value:
+        return None
+    return str(value)
+
+def _write_csv(df: "pd.DataFrame", csv_file: Path) -> None:
+    """Write a DataFrame as UTF-8 CSV with Arrow's C++ writer instead of DataFrame.to_csv."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    
+    # Object columns hold mixed scalars and nested lists/dicts, which Arrow cannot type or
+    # write as CSV, so they are stringified first
+    object_cols = df.select_dtypes(include='object').columns
+    df = df.assign(**{col: df[col].map(_csv_cell) for col in object_cols})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pacsv.write_csv(table, str(csv_file))
+
+@lru_cache(maxsize=None)
+def _row_getter(paths: Tuple[str, ...]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """
+    Compile a function returning the value of every dotted json_normalize-style path (e.g.
+    'author.nickname') for one item, as a tuple, with _MISSING where the path is absent.
+
+    The Apify payload schema is fixed per call site, so the nested lookups are generated once as
+    straight-line code instead of splitting each path and looping over its keys for every item.
+    """
+    lines = ["def row_getter(item):"]
+    for i, path in enumerate(paths):
+        lines.append("    value = item")
+        for key in path.split('.'):
+            lines.append(f"    value = value.get({key!r}, _MISSING) if isinstance(value, dict) else _MISSING")
+        lines.append(f"    v{i} = value")
+    lines.append(f"    return ({''.join(f'v{i}, ' for i in range(len(paths)))})")
+    namespace = {"_MISSING": _MISSING}
+    exec("\n".join(lines), namespace)
+    return namespace["row_getter"]
+
+def _column_values(data: List[Dict[str, Any]], paths: List[str]) -> Dict[str, List[Any]]:
+    """Collect the values of each path present in any item, with None where an item lacks it."""
+    row_getter = _row_getter(tuple(paths))
+    columns = {}
+    for path, values in zip(paths, zip(*map(row_getter, data))):
+        if any(value is not _MISSING for value in values):
+            columns[path] = [None if value is _MISSING else value for value in values]
+    return columns
+
+def _concat_column_values(parts: List[Dict[str, List[Any]]], lengths: List[int]) -> Dict[str, List[Any]]:
+    """Join per-tier column values as if _column_values had been run on the concatenated data."""
+    columns = {}
+    for part in parts:
+        for path in part:
+            columns.setdefault(path, [])
+    for path, values in columns.items():
+        for part, length in zip(parts, lengths):
+            values.extend(part.get(path, [None] * length))
+    return columns
+
+def _columns_frame(columns: Dict[str, List[Any]], length: int) -> "pd.DataFrame":
+    """Build a DataFrame from _column_values output."""
+    import pandas as pd
+    
+    return pd.DataFrame(columns, index=pd.RangeIndex(length))
+
+def _select_columns(data: List[Dict[str, Any]], paths: List[str]) -> "pd.DataFrame":
+    """
+    Build a DataFrame of just the given (possibly nested) fields.
+
+    Equivalent to pd.json_normalize(data)[paths] for the paths present in any item, without
+    flattening every other field of every item first.
+    """
+    return _columns_frame(_column_values(data, paths), len(data))
+
 def analyze_engagement_metrics(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Analyze engagement metrics from TikTok data.
@@ -97,12 +246,51 @@ def analyze_engagement_metrics(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     if not data:
         return {"error": "No data provided"}
     
-    # Convert to DataFrame for easier analysis
-    df = pd.json_normalize(data)
+    # Only the counters and the top-video fields are used, so only they become columns
+    return _engagement_metrics_from_frame(_select_columns(data, ENGAGEMENT_FIELDS))
+
+def _top_k_rows(column: "np.ndarray", k: int) -> "np.ndarray":
+    """
+    Row positions of the k largest values, largest first.
+
+    Same rows and order as DataFrame.nlargest(k, keep='first') (ties go to the earlier row, NaN
+    rows only fill up a short column), but selected with an O(n) partition instead of sorting
+    the whole column.
+    """
+    import numpy as np
+    
+    missing = np.isnan(column)
+    rows = np.flatnonzero(~missing)
+    if len(rows) > k:
+        candidates = column[rows]
+        threshold = np.partition(candidates, len(rows) - k)[len(rows) - k]
+        above = rows[candidates > threshold]
+        ties = rows[candidates == threshold][:k - len(above)]
+        rows = np.sort(np.concatenate([above, ties]))
+    rows = rows[np.argsort(-column[rows], kind='stable')]
+    return np.concatenate([rows, np.flatnonzero(missing)[:k - len(rows)]])
+
+def _engagement_matrix(df: "pd.DataFrame") -> "np.ndarray":
+    """Float matrix of the ENGAGEMENT_COLS counters, one column each, NaN where a column is absent."""
+    import numpy as np
+    
+    matrix = np.full((len(df), len(ENGAGEMENT_COLS)), np.nan)
+    for i, col in enumerate(ENGAGEMENT_COLS):
+        if col in df.columns:
+            matrix[:, i] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return matrix
+
+def _engagement_metrics_from_frame(df: "pd.DataFrame", matrix: Optional["np.ndarray"] = None) -> Dict[str, Any]:
+    """
+    analyze_engagement_metrics on a frame already holding the ENGAGEMENT_FIELDS columns.
+    
+    matrix, if given, is the frame's _engagement_matrix and is used instead of converting
+    the counter columns again.
+    """
+    import numpy as np
     
     # Calculate engagement metrics
-    engagement_cols = ['diggCount', 'shareCount', 'commentCount', 'playCount']
-    available_cols = [col for col in engagement_cols if col in df.columns]
+    available_cols = [col for col in ENGAGEMENT_COLS if col in df.columns]
     
     if not available_cols:
         return {"error": "No engagement metrics found in data"}
@@ -112,29 +300,47 @@ def analyze_engagement_metrics(data: List[Dict[str, Any]]) -> Dict[str, Any]:
         "metrics": {}
     }
     
-    # Basic statistics for each metric
-    for col in available_cols:
-        if col in df.columns:
-            analysis["metrics"][col] = {
-                "mean": float(df[col].mean()) if not df[col].isna().all() else 0,
-                "median": float(df[col].median()) if not df[col].isna().all() else 0,
-                "max": float(df[col].max()) if not df[col].isna().all() else 0,
-                "min": float(df[col].min()) if not df[col].isna().all() else 0,
-                "std": float(df[col].std()) if not df[col].isna().all() else 0
-            }
+    # Basic statistics for each metric, computed for all metrics at once on one 2D array
+    if matrix is None:
+        values = df[available_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = matrix[:, [ENGAGEMENT_COLS.index(col) for col in available_cols]]
+    all_missing = np.isnan(values).all(axis=0)
+    with warnings.catch_warnings():
+        # All-NaN columns are reported as 0 below, so their empty-slice warnings are expected
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = {
+            "mean": np.nanmean(values, axis=0),
+            "median": np.nanmedian(values, axis=0),
+            "max": np.nanmax(values, axis=0),
+            "min": np.nanmin(values, axis=0),
+            "std": np.nanstd(values, axis=0, ddof=1),  # sample std, as pandas computes it
+        }
+    for i, col in enumerate(available_cols):
+        analysis["metrics"][col] = {
+            name: 0 if all_missing[i] else float(column_stats[i]) for name, column_stats in stats.items()
+        }
     
     # Top performing videos (by likes if available)
     if 'diggCount' in df.columns:
-        top_videos = df.nlargest(10, 'diggCount')[['webVideoUrl', 'diggCount', 'text']].to_dict('records')
+        top_rows = _top_k_rows(values[:, available_cols.index('diggCount')], TOP_VIDEOS_COUNT)
+        top_videos = df.iloc[top_rows][['webVideoUrl', 'diggCount', 'text']].to_dict('records')
         analysis["top_videos"] = top_videos
     
     # Engagement rate calculation (if play count available)
     if 'diggCount' in df.columns and 'playCount' in df.columns:
-        df['engagement_rate'] = df['diggCount'] / df['playCount'].replace(0, 1)
-        analysis["engagement_rate"] = {
-            "mean": float(df['engagement_rate'].mean()),
-            "median": float(df['engagement_rate'].median())
-        }
+        likes = values[:, available_cols.index('diggCount')]
+        plays = values[:, available_cols.index('playCount')]
+        # Zero plays count as one play, so those rows keep their like count; dividing into a copy of
+        # the likes column avoids materializing a substituted plays array
+        engagement_rate = likes.copy()
+        np.divide(likes, plays, out=engagement_rate, where=plays != 0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            analysis["engagement_rate"] = {
+                "mean": float(np.nanmean(engagement_rate)),
+                "median": float(np.nanmedian(engagement_rate))
+            }
     
     return analysis
 
@@ -151,8 +357,26 @@ def extract_content_patterns(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     if not data:
         return {"error": "No data provided"}
     
-    df = pd.json_normalize(data)
+    return _content_patterns_from_frame(_select_columns(data, CONTENT_PATTERN_FIELDS))
+
+def _caption_counts(df: "pd.DataFrame") -> Tuple[Counter, Counter]:
+    """Word (lowercased) and hashtag counts over the frame's captions, in one pass."""
+    word_counts = Counter()
+    hashtag_counts = Counter()
+    for text in df['text'].dropna():
+        text = str(text)
+        word_counts.update(text.lower().split())
+        hashtag_counts.update(word for word in text.split() if word.startswith('#'))
+    return word_counts, hashtag_counts
+
+def _content_patterns_from_frame(df: "pd.DataFrame",
+                                 caption_counts: Optional[Tuple[Counter, Counter]] = None) -> Dict[str, Any]:
+    """
+    extract_content_patterns on a frame already holding the CONTENT_PATTERN_FIELDS columns.
     
+    caption_counts, if given, is the frame's _caption_counts and is used instead of tokenizing
+    the captions again.
+    """
     patterns = {
         "total_videos": len(df),
         "content_analysis": {}
@@ -160,23 +384,13 @@ def extract_content_patterns(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     
     # Text analysis if available
     if 'text' in df.columns:
-        texts = df['text'].dropna()
-        
-        # Common words/phrases (simple analysis)
-        all_text = ' '.join(texts.str.lower())
-        words = all_text.split()
-        
-        from collections import Counter
-        common_words = Counter(words).most_common(20)
-        patterns["content_analysis"]["common_words"] = common_words
+        # Common words/phrases and hashtags
+        word_counts, hashtag_counts = caption_counts or _caption_counts(df)
+        patterns["content_analysis"]["common_words"] = word_counts.most_common(20)
         
         # Hashtag analysis
-        hashtags = []
-        for text in texts:
-            hashtags.extend([word for word in str(text).split() if word.startswith('#')])
-        
-        if hashtags:
-            common_hashtags = Counter(hashtags).most_common(10)
+        if hashtag_counts:
+            common_hashtags = hashtag_counts.most_common(10)
             patterns["content_analysis"]["common_hashtags"] = common_hashtags
     
     # Creator analysis
@@ -211,10 +425,29 @@ def generate_tier_comparison_report(tier_results: Dict[str, ScrapingResult]) ->
         "cross_tier_insights": {}
     }
     
+    # Each tier's fields are looked up once and shared by the per-tier and cross-tier analyses
+    tier_columns = {tier: _column_values(result.data, REPORT_FIELDS) for tier, result in tier_results.items()}
+    
+    # Counters are converted to floats and captions tokenized once per tier; the cross-tier
+    # stats stack the matrices and sum the word/hashtag counts. Summing tier Counters in tier
+    # order keeps first-seen order, so most_common ties break as over the combined captions
+    tier_matrices = []
+    overall_words = Counter()
+    overall_hashtags = Counter()
+    
     # Summary comparison
     for tier, result in tier_results.items():
-        engagement = analyze_engagement_metrics(result.data)
-        patterns = extract_content_patterns(result.data)
+        if result.data:
+            df = _columns_frame(tier_columns[tier], len(result.data))
+            tier_matrices.append(_engagement_matrix(df))
+            engagement = _engagement_metrics_from_frame(df, tier_matrices[-1])
+            caption_counts = _caption_counts(df) if 'text' in df.columns else None
+            if caption_counts:
+                overall_words.update(caption_counts[0])
+                overall_hashtags.update(caption_counts[1])
+            patterns = _content_patterns_from_frame(df, caption_counts)
+        else:
+            engagement = patterns = {"error": "No data provided"}
         
         report["comparison_summary"][tier] = {
             "total_videos": result.total_items,
@@ -228,27 +461,35 @@ def generate_tier_comparison_report(tier_results: Dict[str, ScrapingResult]) ->
         }
     
     # Cross-tier insights
-    all_data = []
-    for result in tier_results.values():
-        all_data.extend(result.data)
+    lengths = [len(result.data) for result in tier_results.values()]
+    total_videos = sum(lengths)
+    
+    if total_videos:
+        import numpy as np
+        
+        all_df = _columns_frame(_concat_column_values(list(tier_columns.values()), lengths), total_videos)
+        overall_engagement = _engagement_metrics_from_frame(all_df, np.vstack(tier_matrices))
+        overall_patterns = _content_patterns_from_frame(all_df, (overall_words, overall_hashtags))
+    else:
+        overall_engagement = overall_patterns = {"error": "No data provided"}
     
     report["cross_tier_insights"] = {
-        "total_videos_all_tiers": len(all_data),
-        "overall_engagement": analyze_engagement_metrics(all_data),
-        "overall_patterns": extract_content_patterns(all_data)
+        "total_videos_all_tiers": total_videos,
+        "overall_engagement": overall_engagement,
+        "overall_patterns": overall_patterns
     }
     
     return report
 
-def save_analysis_report(report: Dict[str, Any], filename: str) -> Path:
-    """Save analysis report to file."""
-    data_dir = ensure_data_directory()
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def save_analysis_report(report: Dict[str, Any], filename: str, timestamp: Optional[str] = None) -> Path:
+    """Save analysis report to file, stamped with the run timestamp if given."""
+    analysis_dir = _data_dirs().analysis
+    timestamp = _file_timestamp(timestamp)
     
-    report_file = data_dir / "analysis" / f"{filename}_{timestamp}.json"
+    report_file = analysis_dir / f"{filename}_{timestamp}.json"
     
-    with open(report_file, 'w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    with open(report_file, 'wb') as f:
+        f.write(orjson.dumps(report, option=ORJSON_OPTIONS))
     
     logger.info(f"📊 Analysis report saved: {report_file}")
     return report_file
\ No newline at end of file
@@ -8,6 +8,7 @@ and generates comprehensive analysis reports.
 import argparse
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -15,8 +16,8 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from tier_scraper import scrape_tier1_fyp, scrape_tier2_pet_parents, scrape_tier3_cat_moms
-from data_processor import generate_tier_comparison_report, save_analysis_report
+from tier_scraper import scrape_tier1_fyp, scrape_tier2_pet_parents, scrape_tier3_cat_moms, TIER_SCRAPE_CONCURRENCY
+from data_processor import generate_tier_comparison_report, save_analysis_report, TIMESTAMP_FORMAT, DEFAULT_SAVE_FORMATS
 from apify_client import ScrapingResult
 
 # Setup logging
@@ -28,7 +29,8 @@ logger = logging.getLogger(__name__)
 
 def run_complete_analysis(max_items_per_tier: int = None, 
                          save_individual: bool = True,
-                         generate_report: bool = True) -> dict:
+                         generate_report: bool = True,
+                         formats: tuple = DEFAULT_SAVE_FORMATS) -> dict:
     """
     Run complete TikTok analytics data collection across all tiers.
     
@@ -36,6 +38,7 @@ def run_complete_analysis(max_items_per_tier: int = None,
         max_items_per_tier: Maximum items to collect per tier
         save_individual: Whether to save individual tier results
         generate_report: Whether to generate cross-tier analysis report
+        formats: Formats to save the tier results in, see save_scraping_results
         
     Returns:
         Dictionary containing all results and analysis
@@ -44,40 +47,49 @@ def run_complete_analysis(max_items_per_tier: int = None,
     logger.info("=" * 60)
     
     start_time = datetime.now()
+    # Every file saved during this run shares one timestamp, so a run's outputs group together
+    run_timestamp = start_time.strftime(TIMESTAMP_FORMAT)
     results = {}
     
     try:
-        # Tier 1: Broad FYP Content
-        logger.info("📈 PHASE 1: Collecting broad FYP viral content...")
-        tier1_result = scrape_tier1_fyp(max_items=max_items_per_tier, save_data=save_individual)
-        results['tier1'] = tier1_result
-        
-        logger.info(f"   ✅ Tier 1 complete: {tier1_result.total_items} videos")
-        logger.info(f"   🎯 Focus: Viral mechanics, mass-appeal hooks, trending formats")
-        
-        # Tier 2: Pet Parent Bridge
-        logger.info("\n🐕 PHASE 2: Collecting pet parent bridge content...")
-        tier2_result = scrape_tier2_pet_parents(max_items=max_items_per_tier, save_data=save_individual)
-        results['tier2'] = tier2_result
-        
-        logger.info(f"   ✅ Tier 2 complete: {tier2_result.total_items} videos")
-        logger.info(f"   🎯 Focus: General-to-pet audience bridging, pet parent themes")
-        
-        # Tier 3: Cat Mom Niche  
-        logger.info("\n🐱 PHASE 3: Collecting cat mom niche content...")
-        tier3_result = scrape_tier3_cat_moms(max_items=max_items_per_tier, save_data=save_individual)
-        results['tier3'] = tier3_result
-        
-        logger.info(f"   ✅ Tier 3 complete: {tier3_result.total_items} videos")
-        logger.info(f"   🎯 Focus: Cat mom pain points, insurance topics, product reviews")
+        # The three tiers are independent Apify runs, so they are collected at the same time
+        logger.info("📈 PHASE 1-3: Collecting FYP, pet parent and cat mom content in parallel...")
+        with ThreadPoolExecutor(max_workers=TIER_SCRAPE_CONCURRENCY) as executor:
+            tier1_future = executor.submit(scrape_tier1_fyp, max_items=max_items_per_tier, save_data=save_individual,
+                                           formats=formats, timestamp=run_timestamp)
+            tier2_future = executor.submit(scrape_tier2_pet_parents, max_items=max_items_per_tier, save_data=save_individual,
+                                           formats=formats, timestamp=run_timestamp)
+            tier3_future = executor.submit(scrape_tier3_cat_moms, max_items=max_items_per_tier, save_data=save_individual,
+                                           formats=formats, timestamp=run_timestamp)
+            
+            # Tier 1: Broad FYP Content
+            tier1_result = tier1_future.result()
+            results['tier1'] = tier1_result
+            
+            logger.info("   ✅ Tier 1 complete: %d videos", tier1_result.total_items)
+            logger.info("   🎯 Focus: Viral mechanics, mass-appeal hooks, trending formats")
+            
+            # Tier 2: Pet Parent Bridge
+            tier2_result = tier2_future.result()
+            results['tier2'] = tier2_result
+            
+            logger.info("   ✅ Tier 2 complete: %d videos", tier2_result.total_items)
+            logger.info("   🎯 Focus: General-to-pet audience bridging, pet parent themes")
+            
+            # Tier 3: Cat Mom Niche
+            tier3_result = tier3_future.result()
+            results['tier3'] = tier3_result
+            
+            logger.info("   ✅ Tier 3 complete: %d videos", tier3_result.total_items)
+            logger.info("   🎯 Focus: Cat mom pain points, insurance topics, product reviews")
         
         # Generate comprehensive analysis report
         if generate_report:
             logger.info("\n📊 PHASE 4: Generating cross-tier analysis report...")
             analysis_report = generate_tier_comparison_report(results)
-            report_file = save_analysis_report(analysis_report, "complete_tier_analysis")
+            report_file = save_analysis_report(analysis_report, "complete_tier_analysis", timestamp=run_timestamp)
             
-            logger.info(f"   ✅ Analysis report saved: {report_file}")
+            logger.info("   ✅ Analysis report saved: %s", report_file)
             results['analysis_report'] = analysis_report
             results['report_file'] = report_file
         
@@ -85,30 +97,32 @@ def run_complete_analysis(max_items_per_tier: int = None,
         total_videos = sum(r.total_items for r in [tier1_result, tier2_result, tier3_result])
         total_time = datetime.now() - start_time
         
-        logger.info("\n" + "=" * 60)
-        logger.info("🎉 COMPLETE ANALYSIS FINISHED!")
-        logger.info("=" * 60)
-        logger.info(f"📊 TIER 1 (FYP Broad):     {tier1_result.total_items:>6} videos")
-        logger.info(f"🐕 TIER 2 (Pet Parents):   {tier2_result.total_items:>6} videos")
-        logger.info(f"🐱 TIER 3 (Cat Moms):      {tier3_result.total_items:>6} videos")
-        logger.info(f"📈 TOTAL VIDEOS COLLECTED: {total_videos:>6}")
-        logger.info(f"⏱️  TOTAL EXECUTION TIME:   {total_time}")
-        logger.info("=" * 60)
-        
-        # Key insights summary
-        logger.info("\n🔍 KEY COLLECTION INSIGHTS:")
-        logger.info(f"   • Viral Content Analysis: Ready for hook/format pattern extraction")
-        logger.info(f"   • Audience Bridging Data: Ready for transition strategy analysis")  
-        logger.info(f"   • Niche Targeting Intel: Ready for cat mom pain point mapping")
-        logger.info(f"   • Cross-Tier Comparison: Available for funnel optimization insights")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("\n" + "=" * 60)
+            logger.info("🎉 COMPLETE ANALYSIS FINISHED!")
+            logger.info("=" * 60)
+            logger.info("📊 TIER 1 (FYP Broad):     %6d videos", tier1_result.total_items)
+            logger.info("🐕 TIER 2 (Pet Parents):   %6d videos", tier2_result.total_items)
+            logger.info("🐱 TIER 3 (Cat Moms):      %6d videos", tier3_result.total_items)
+            logger.info("📈 TOTAL VIDEOS COLLECTED: %6d", total_videos)
+            logger.info("⏱️  TOTAL EXECUTION TIME:   %s", total_time)
+            logger.info("=" * 60)
+            
+            # Key insights summary
+            logger.info("\n🔍 KEY COLLECTION INSIGHTS:")
+            logger.info("   • Viral Content Analysis: Ready for hook/format pattern extraction")
+            logger.info("   • Audience Bridging Data: Ready for transition strategy analysis")
+            logger.info("   • Niche Targeting Intel: Ready for cat mom pain point mapping")
+            logger.info("   • Cross-Tier Comparison: Available for funnel optimization insights")
         
         return results
         
     except Exception as e:
-        logger.error(f"❌ Analysis pipeline failed: {str(e)}")
+        logger.error("❌ Analysis pipeline failed: %s", e)
         raise
 
-def run_single_tier_analysis(tier: str, max_items: int = None) -> ScrapingResult:
+def run_single_tier_analysis(tier: str, max_items: int = None,
+                             formats: tuple = DEFAULT_SAVE_FORMATS) -> ScrapingResult:
     """Run analysis for a single tier."""
     tier_functions = {
         "tier1": scrape_tier1_fyp,
@@ -119,10 +133,10 @@ def run_single_tier_analysis(tier: str, max_items: int = None) -> ScrapingResult
     if tier not in tier_functions:
         raise ValueError(f"Invalid tier: {tier}. Available: {list(tier_functions.keys())}")
     
-    logger.info(f"🎯 Running single tier analysis: {tier.upper()}")
-    result = tier_functions[tier](max_items=max_items, save_data=True)
+    logger.info("🎯 Running single tier analysis: %s", tier.upper())
+    result = tier_functions[tier](max_items=max_items, save_data=True, formats=formats)
     
-    logger.info(f"✅ {tier.upper()} analysis complete: {result.total_items} videos collected")
+    logger.info("✅ %s analysis complete: %d videos collected", tier.upper(), result.total_items)
     return result
 
 def main():
@@ -150,9 +164,13 @@ Examples:
                        help="Don't save individual tier results")
     parser.add_argument("--no-report", action="store_true", 
                        help="Skip cross-tier analysis report generation")
+    parser.add_argument("--csv", action="store_true",
+                       help="Also save tier results as CSV")
     
     args = parser.parse_args()
     
+    formats = ("json", "csv") if args.csv else DEFAULT_SAVE_FORMATS
+    
     # Set max items based on flags
     max_items = args.max_items
     if args.quick and not max_items:
@@ -161,15 +179,16 @@ Examples:
     try:
         if args.tier:
             # Single tier analysis
-            result = run_single_tier_analysis(args.tier, max_items)
-            logger.info(f"🎯 Analysis complete for {args.tier.upper()}")
+            result = run_single_tier_analysis(args.tier, max_items, formats)
+            logger.info("🎯 Analysis complete for %s", args.tier.upper())
             
         else:
             # Complete pipeline
             results = run_complete_analysis(
                 max_items_per_tier=max_items,
                 save_individual=not args.no_save,
-                generate_report=not args.no_report
+                generate_report=not args.no_report,
+                formats=formats
             )
             
             logger.info("🏁 Complete TikTok ad format analytics pipeline finished!")
@@ -181,7 +200,7 @@ Examples:
         logger.info("\n⏹️  Analysis interrupted by user")
         return 1
     except Exception as e:
-        logger.error(f"❌ Pipeline failed: {str(e)}")
+        logger.error("❌ Pipeline failed: %s", e)
         return 1
 
 if __name__ == "__main__":
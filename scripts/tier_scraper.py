@@ -4,19 +4,25 @@ Individual tier scraping scripts for targeted TikTok data collection.
 import argparse
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import logging
 
 from apify_client import ApifyClient, ScrapingResult
 from config import TIER_CONFIGS
-from data_processor import save_scraping_results
+from data_processor import save_scraping_results, DEFAULT_SAVE_FORMATS
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def scrape_tier1_fyp(max_items: int = None, save_data: bool = True) -> ScrapingResult:
+# Tiers scraped at the same time by "all"; each holds one Apify actor run, so keep this within
+# the account's concurrent run limit
+TIER_SCRAPE_CONCURRENCY = 3
+
+def scrape_tier1_fyp(max_items: int = None, save_data: bool = True,
+                     formats: tuple = DEFAULT_SAVE_FORMATS, timestamp: str = None) -> ScrapingResult:
     """
     Scrape Tier 1: Broad FYP content that catches massive eyeballs.
     
@@ -30,18 +36,19 @@ def scrape_tier1_fyp(max_items: int = None, save_data: bool = True) -> ScrapingR
     try:
         result = client.scrape_tier_data("tier1", max_items=max_items)
         
-        logger.info(f"✅ Tier 1 completed: {result.total_items} videos collected in {result.execution_time:.2f}s")
+        logger.info("✅ Tier 1 completed: %d videos collected in %.2fs", result.total_items, result.execution_time)
         
         if save_data:
-            save_scraping_results(result, "tier1_fyp_broad")
+            save_scraping_results(result, "tier1_fyp_broad", formats=formats, timestamp=timestamp)
             
         return result
         
     except Exception as e:
-        logger.error(f"❌ Tier 1 scraping failed: {str(e)}")
+        logger.error("❌ Tier 1 scraping failed: %s", e)
         raise
 
-def scrape_tier2_pet_parents(max_items: int = None, save_data: bool = True) -> ScrapingResult:
+def scrape_tier2_pet_parents(max_items: int = None, save_data: bool = True,
+                             formats: tuple = DEFAULT_SAVE_FORMATS, timestamp: str = None) -> ScrapingResult:
     """
     Scrape Tier 2: Pet parent bridge content.
     
@@ -55,18 +62,19 @@ def scrape_tier2_pet_parents(max_items: int = None, save_data: bool = True) -> S
     try:
         result = client.scrape_tier_data("tier2", max_items=max_items)
         
-        logger.info(f"✅ Tier 2 completed: {result.total_items} videos collected in {result.execution_time:.2f}s")
+        logger.info("✅ Tier 2 completed: %d videos collected in %.2fs", result.total_items, result.execution_time)
         
         if save_data:
-            save_scraping_results(result, "tier2_pet_parents")
+            save_scraping_results(result, "tier2_pet_parents", formats=formats, timestamp=timestamp)
             
         return result
         
     except Exception as e:
-        logger.error(f"❌ Tier 2 scraping failed: {str(e)}")
+        logger.error("❌ Tier 2 scraping failed: %s", e)
         raise
 
-def scrape_tier3_cat_moms(max_items: int = None, save_data: bool = True) -> ScrapingResult:
+def scrape_tier3_cat_moms(max_items: int = None, save_data: bool = True,
+                          formats: tuple = DEFAULT_SAVE_FORMATS, timestamp: str = None) -> ScrapingResult:
     """
     Scrape Tier 3: Specific cat mom niche content.
     
@@ -80,18 +88,19 @@ def scrape_tier3_cat_moms(max_items: int = None, save_data: bool = True) -> Scra
     try:
         result = client.scrape_tier_data("tier3", max_items=max_items)
         
-        logger.info(f"✅ Tier 3 completed: {result.total_items} videos collected in {result.execution_time:.2f}s")
+        logger.info("✅ Tier 3 completed: %d videos collected in %.2fs", result.total_items, result.execution_time)
         
         if save_data:
-            save_scraping_results(result, "tier3_cat_moms")
+            save_scraping_results(result, "tier3_cat_moms", formats=formats, timestamp=timestamp)
             
         return result
         
     except Exception as e:
-        logger.error(f"❌ Tier 3 scraping failed: {str(e)}")
+        logger.error("❌ Tier 3 scraping failed: %s", e)
         raise
 
-def scrape_single_tier(tier: str, max_items: int = None, save_data: bool = True) -> ScrapingResult:
+def scrape_single_tier(tier: str, max_items: int = None, save_data: bool = True,
+                       formats: tuple = DEFAULT_SAVE_FORMATS, timestamp: str = None) -> ScrapingResult:
     """
     Scrape a specific tier by name.
     
@@ -99,6 +108,8 @@ def scrape_single_tier(tier: str, max_items: int = None, save_data: bool = True)
         tier: Tier name (tier1, tier2, or tier3)
         max_items: Maximum number of items to scrape
         save_data: Whether to save results to file
+        formats: Formats to save, see save_scraping_results
+        timestamp: Timestamp for saved file names (defaults to the time of the save)
     """
     tier_functions = {
         "tier1": scrape_tier1_fyp,
@@ -109,7 +120,8 @@ def scrape_single_tier(tier: str, max_items: int = None, save_data: bool = True)
     if tier not in tier_functions:
         raise ValueError(f"Invalid tier: {tier}. Available: {list(tier_functions.keys())}")
         
-    return tier_functions[tier](max_items=max_items, save_data=save_data)
+    return tier_functions[tier](max_items=max_items, save_data=save_data, formats=formats,
+                                timestamp=timestamp)
 
 def main():
     """Command line interface for tier scraping."""
@@ -122,39 +134,46 @@ def main():
                        help="Don't save results to file")
     parser.add_argument("--output-dir", type=str, default="data",
                        help="Output directory for results")
+    parser.add_argument("--csv", action="store_true",
+                       help="Also save results as CSV")
     
     args = parser.parse_args()
     
     # Set output directory
     os.environ["TIKTOK_DATA_DIR"] = args.output_dir
+    formats = ("json", "csv") if args.csv else DEFAULT_SAVE_FORMATS
     
     try:
         if args.tier == "all":
             logger.info("🚀 Starting full tier analysis pipeline...")
             
-            results = {}
-            for tier in ["tier1", "tier2", "tier3"]:
-                result = scrape_single_tier(tier, args.max_items, not args.no_save)
-                results[tier] = result
+            # Each tier is one blocking run-sync call, so run them side by side instead of back to back
+            tiers = ["tier1", "tier2", "tier3"]
+            with ThreadPoolExecutor(max_workers=TIER_SCRAPE_CONCURRENCY) as executor:
+                tier_results = executor.map(
+                    lambda tier: scrape_single_tier(tier, args.max_items, not args.no_save, formats), tiers
+                )
+                results = dict(zip(tiers, tier_results))
                 
             # Summary
             total_videos = sum(r.total_items for r in results.values())
             total_time = sum(r.execution_time for r in results.values())
             
-            logger.info("="*50)
-            logger.info("📊 COMPLETE TIER ANALYSIS SUMMARY")
-            logger.info("="*50)
-            for tier, result in results.items():
-                logger.info(f"{tier.upper()}: {result.total_items} videos ({result.execution_time:.1f}s)")
-            logger.info(f"TOTAL: {total_videos} videos collected in {total_time:.1f}s")
-            logger.info("="*50)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("="*50)
+                logger.info("📊 COMPLETE TIER ANALYSIS SUMMARY")
+                logger.info("="*50)
+                for tier, result in results.items():
+                    logger.info("%s: %d videos (%.1fs)", tier.upper(), result.total_items, result.execution_time)
+                logger.info("TOTAL: %d videos collected in %.1fs", total_videos, total_time)
+                logger.info("="*50)
             
         else:
-            result = scrape_single_tier(args.tier, args.max_items, not args.no_save)
-            logger.info(f"✅ {args.tier.upper()} scraping completed: {result.total_items} videos")
+            result = scrape_single_tier(args.tier, args.max_items, not args.no_save, formats)
+            logger.info("✅ %s scraping completed: %d videos", args.tier.upper(), result.total_items)
             
     except Exception as e:
-        logger.error(f"❌ Scraping failed: {str(e)}")
+        logger.error("❌ Scraping failed: %s", e)
         return 1
         
     return 0
@@ -0,0 +1,66 @@
+import sys
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+# Add data_pipeline directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data_pipeline')))
+
+from hypothesis_engine import HypothesisEngine
+
+
+def pytest_configure(config):
+    # Integration tests are marked slow; run just the unit tests with `pytest -m "not slow"`
+    config.addinivalue_line("markers", "slow: end-to-end integration tests")
+
+
+@pytest.fixture(scope="session")
+def sample_analysis_data():
+    """Sample data after Gemini analysis (shared, treat as read-only)"""
+    df = pd.DataFrame({
+        'post_id': ['VIRAL1', 'VIRAL2', 'NONVIRAL1', 'NONVIRAL2'],
+        'Post URL': [
+            'https://www.instagram.com/reel/VIRAL1/',
+            'https://www.instagram.com/reel/VIRAL2/',
+            'https://www.instagram.com/reel/NONVIRAL1/',
+            'https://www.instagram.com/reel/NONVIRAL2/'
+        ],
+        'Views': np.array([100000, 150000, 5000, 3000], dtype='int64'),
+        'Likes': np.array([10000, 15000, 500, 300], dtype='int64'),
+        'Comments': np.array([500, 800, 50, 30], dtype='int64'),
+        'viral': np.array([True, True, False, False]),
+        'video_analysis': [
+            'Engaging hook in first 3 seconds',
+            'Dynamic camera work',
+            'Slow opening',
+            'Generic content'
+        ],
+        'virality_analysis': [
+            'Strong emotional appeal',
+            'Trending audio used',
+            'Low engagement',
+            'Minimal reach'
+        ]
+    })
+    snapshot = df.copy()
+    
+    yield df
+    
+    # Every test sees this same frame, so a test that mutated it fails the session loudly
+    pd.testing.assert_frame_equal(df, snapshot)
+
+
+@pytest.fixture(scope="session")
+def engine(sample_analysis_data):
+    """HypothesisEngine built once over the sample data"""
+    return HypothesisEngine(sample_analysis_data)
+
+
+@pytest.fixture(scope="session")
+def engine_outputs(engine):
+    """Observations, hypotheses and ad formats generated once by the shared engine"""
+    observations = engine.compare_viral_vs_non_viral_observations()
+    hypotheses = engine.generate_cross_category_hypothesis()
+    ad_formats = engine.generate_ad_formats_suggestions(hypotheses)
+    return observations, hypotheses, ad_formats
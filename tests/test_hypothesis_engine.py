@@ -1,110 +1,68 @@
-import sys
-import os
 import pytest
-import pandas as pd
-import json
-
-# Add data_pipeline directory to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data_pipeline')))
 
 from hypothesis_engine import HypothesisEngine
 
 
+# Output schemas: key -> (expected type, must be non-empty)
+OBSERVATIONS_SCHEMA = {
+    'viral_patterns_observed': (list, False),
+    'non_viral_gaps_identified': (list, False),
+    'metrics_comparison': (dict, False),
+}
+HYPOTHESES_SCHEMA = {'hypotheses': (list, True)}
+AD_FORMATS_SCHEMA = {'ad_formats': (list, True)}
+
+
+def assert_matches_schema(result, schema):
+    """Assert that result is a dict matching schema, reporting every mismatched key at once"""
+    assert isinstance(result, dict)
+    mismatched = [
+        key for key, (expected_type, non_empty) in schema.items()
+        if not isinstance(result.get(key), expected_type) or (non_empty and not result[key])
+    ]
+    assert not mismatched, f"Fields not matching the output schema: {mismatched}"
+
+
 class TestHypothesisEngine:
     """Test the mock Hypothesis Engine"""
     
-    @pytest.fixture
-    def sample_data(self):
-        """Create sample data for testing"""
-        return pd.DataFrame([
-            {
-                'post_id': 'VIRAL1',
-                'Post URL': 'https://instagram.com/reel/VIRAL1/',
-                'viral': True,
-                'Views': 100000,
-                'Likes': 10000,
-                'Comments': 500,
-                'video_analysis': 'Mock viral analysis 1',
-                'virality_analysis': 'This went viral because...'
-            },
-            {
-                'post_id': 'VIRAL2',
-                'Post URL': 'https://instagram.com/reel/VIRAL2/',
-                'viral': True,
-                'Views': 150000,
-                'Likes': 15000,
-                'Comments': 800,
-                'video_analysis': 'Mock viral analysis 2',
-                'virality_analysis': 'Strong engagement...'
-            },
-            {
-                'post_id': 'NONVIRAL1',
-                'Post URL': 'https://instagram.com/reel/NONVIRAL1/',
-                'viral': False,
-                'Views': 5000,
-                'Likes': 500,
-                'Comments': 50,
-                'video_analysis': 'Mock non-viral analysis 1',
-                'virality_analysis': 'Low engagement...'
-            },
-            {
-                'post_id': 'NONVIRAL2',
-                'Post URL': 'https://instagram.com/reel/NONVIRAL2/',
-                'viral': False,
-                'Views': 3000,
-                'Likes': 300,
-                'Comments': 30,
-                'video_analysis': 'Mock non-viral analysis 2',
-                'virality_analysis': 'Minimal reach...'
-            }
-        ])
-    
-    def test_initialization(self, sample_data):
+    def test_initialization(self, engine):
         """Test that HypothesisEngine initializes correctly"""
-        engine = HypothesisEngine(sample_data)
-        
         assert engine is not None
         assert len(engine.df) == 4
         assert len(engine.viral_df) == 2
         assert len(engine.non_viral_df) == 2
     
-    def test_compare_observations_returns_dict(self, sample_data):
+    def test_initialization_without_viral_column(self, sample_analysis_data):
+        """Test that posts without a viral label are all treated as non-viral"""
+        engine = HypothesisEngine(sample_analysis_data.drop(columns=['viral']))
+        
+        assert len(engine.viral_df) == 0
+        assert len(engine.non_viral_df) == 4
+    
+    def test_compare_observations_returns_dict(self, engine_outputs):
         """Test that compare_observations returns a dictionary"""
-        engine = HypothesisEngine(sample_data)
-        result = engine.compare_viral_vs_non_viral_observations()
+        result, _, _ = engine_outputs
         
-        assert isinstance(result, dict)
-        assert 'viral_patterns_observed' in result
-        assert 'non_viral_gaps_identified' in result
-        assert 'metrics_comparison' in result
+        assert_matches_schema(result, OBSERVATIONS_SCHEMA)
         print(f"\n✅ Comparative observations generated with {len(result['viral_patterns_observed'])} patterns")
     
-    def test_generate_hypotheses_returns_dict(self, sample_data):
+    def test_generate_hypotheses_returns_dict(self, engine_outputs):
         """Test that hypothesis generation returns a dictionary"""
-        engine = HypothesisEngine(sample_data)
-        result = engine.generate_cross_category_hypothesis()
+        _, result, _ = engine_outputs
         
-        assert isinstance(result, dict)
-        assert 'hypotheses' in result
-        assert isinstance(result['hypotheses'], list)
-        assert len(result['hypotheses']) > 0
+        assert_matches_schema(result, HYPOTHESES_SCHEMA)
         print(f"\n✅ Generated {len(result['hypotheses'])} hypotheses")
     
-    def test_generate_ad_formats_returns_dict(self, sample_data):
+    def test_generate_ad_formats_returns_dict(self, engine_outputs):
         """Test that ad format generation returns a dictionary"""
-        engine = HypothesisEngine(sample_data)
-        hypotheses = engine.generate_cross_category_hypothesis()
-        result = engine.generate_ad_formats_suggestions(hypotheses)
+        _, _, result = engine_outputs
         
-        assert isinstance(result, dict)
-        assert 'ad_formats' in result
-        assert isinstance(result['ad_formats'], list)
-        assert len(result['ad_formats']) > 0
+        assert_matches_schema(result, AD_FORMATS_SCHEMA)
         print(f"\n✅ Generated {len(result['ad_formats'])} ad format suggestions")
     
-    def test_get_summary_stats(self, sample_data):
+    def test_get_summary_stats(self, engine):
         """Test summary statistics calculation"""
-        engine = HypothesisEngine(sample_data)
         stats = engine.get_summary_stats()
         
         assert stats['total_posts'] == 4
@@ -113,14 +71,13 @@ class TestHypothesisEngine:
         assert stats['viral_percentage'] == 50.0
         print(f"\n✅ Stats: {stats}")
     
-    def test_mock_data_has_labels(self, sample_data):
+    def test_mock_data_has_labels(self, engine_outputs):
         """Test that mock data is properly labeled with [MOCK]"""
-        engine = HypothesisEngine(sample_data)
-        result = engine.compare_viral_vs_non_viral_observations()
+        result, _, _ = engine_outputs
         
         # Check that mock labels exist
         patterns = result['viral_patterns_observed']
-        assert any('[MOCK]' in pattern for pattern in patterns)
+        assert '[MOCK]' in '\n'.join(patterns)
         print(f"\n✅ Mock labels found in output")
 
 
@@ -1,46 +1,41 @@
 import pytest
+import pandas as pd
 
-
-def extract_post_id_from_url(url: str) -> str:
-    """
-    Extract post ID (shortcode) from Instagram URL.
-    Copied here for testing to avoid import issues.
-    """
-    try:
-        parts = url.rstrip('/').split('/')
-        if 'p' in parts:
-            p_index = parts.index('p')
-            return parts[p_index + 1] if len(parts) > p_index + 1 else parts[-1]
-        
-        post_id = parts[-1] if parts[-1] else parts[-2]
-        return post_id
-    except:
-        return None
+from post_ids import extract_post_id_from_url, extract_post_ids
 
 
 class TestPostIdExtraction:
     """Test post ID extraction from URLs"""
     
-    def test_extract_reel_url(self):
-        """Test extracting ID from reel URL"""
-        url = "https://www.instagram.com/reel/C8mtEPSp4b8/"
-        result = extract_post_id_from_url(url)
-        assert result == "C8mtEPSp4b8"
-    
-    def test_extract_post_url_with_p(self):
-        """Test extracting ID from post URL with 'p' path"""
-        url = "https://www.instagram.com/p/ABC123456/"
-        result = extract_post_id_from_url(url)
-        assert result == "ABC123456"
-    
-    def test_extract_without_trailing_slash(self):
-        """Test URL without trailing slash"""
-        url = "https://www.instagram.com/reel/XYZ789"
-        result = extract_post_id_from_url(url)
-        assert result == "XYZ789"
+    @pytest.mark.parametrize('url,expected', [
+        pytest.param("https://www.instagram.com/reel/C8mtEPSp4b8/", "C8mtEPSp4b8", id="reel"),
+        pytest.param("https://www.instagram.com/p/ABC123456/", "ABC123456", id="post-with-p"),
+        pytest.param("https://www.instagram.com/reel/XYZ789", "XYZ789", id="no-trailing-slash"),
+        pytest.param("https://www.instagram.com/reel/C8mtEPSp4b8/?igsh=abc123", "C8mtEPSp4b8", id="query-string"),
+        pytest.param("https://www.instagram.com/stories/someuser/3141592653/", "3141592653", id="last-segment-fallback"),
+    ])
+    def test_extract(self, url, expected):
+        """Test extracting the ID from reel/post URLs, ignoring share parameters"""
+        assert extract_post_id_from_url(url) == expected
     
     def test_invalid_url_returns_none(self):
         """Test that invalid URLs return None"""
         url = "not_a_url"
         result = extract_post_id_from_url(url)
         assert result is None or result == "not_a_url"
+    
+    def test_vectorized_matches_scalar(self):
+        """Test that the vectorized extraction agrees with the per-URL function"""
+        urls = [
+            "https://www.instagram.com/reel/C8mtEPSp4b8/",
+            "https://www.instagram.com/p/ABC123456/",
+            "https://www.instagram.com/reel/XYZ789",
+            "https://www.instagram.com/user/p",
+            "https://www.instagram.com/tv/TV12345/?igsh=abc",
+            "https://www.instagram.com/stories/someuser/3141592653/",
+            "not_a_url",
+        ]
+        result = extract_post_ids(pd.Series(urls)).tolist()
+        assert result == [extract_post_id_from_url(url) for url in urls]
+        
+        assert extract_post_ids(pd.Series([None, ""])).isna().all()